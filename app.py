@@ -1,22 +1,24 @@
 import html as html_mod
 import io
 import logging
+import os
 import random
-import time
+import re
 
 import streamlit as st
 from PIL import Image, ImageDraw, ImageFont
 
-from rcjy_config import RCJY_LOGO_URL, SUPPORTED_FILE_TYPES, has_credentials
-from content_extractor import get_content_from_input
+from rcjy_config import MODELS, RATE_LIMIT_MAX_WAIT, RCJY_LOGO_URL, SUPPORTED_FILE_TYPES, has_credentials
+from content_extractor import extract_content
 from generators import (
     _sanitize_error,
     generate_image,
-    generate_podcast,
-    generate_text,
-    generate_video,
+    generate_image_variants,
+    generate_text_stream,
     generate_voice,
 )
+import jobs
+from rate_limiter import get_limiter
 
 try:
     import history
@@ -34,6 +36,8 @@ except Exception as _hist_err:
         history = None
         _history_ok = False
 
+jobs.configure(history if _history_ok else None)
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s [%(name)s] %(levelname)s: %(message)s",
@@ -41,21 +45,27 @@ logging.basicConfig(
 )
 logger = logging.getLogger("rcjy.app")
 
-# rate limiting per session
-_RATE_COOLDOWN = {"text": 5, "image": 10, "video": 30, "voice": 10, "podcast": 20}
-
-def _rate_check(action: str) -> bool:
-    # Returns True if allowed, False if rate limited
-    key = f"_last_{action}"
-    now = time.time()
-    last = st.session_state.get(key, 0)
-    cooldown = _RATE_COOLDOWN.get(action, 10)
-    if now - last < cooldown:
-        remaining = int(cooldown - (now - last))
-        msg = f"انتظر {remaining} ثانية" if st.session_state.get("ui_lang") == "ar" else f"Please wait {remaining}s before generating again"
+_HIST_PAGE_SIZE = 20
+
+# rate limiting: shared per-model token buckets (see rate_limiter.py)
+def _rate_check(action: str, model: str = None) -> bool:
+    # Returns True if the model's queue is short enough to take the request;
+    # the generator then waits its turn for a token
+    models = MODELS.get(action)
+    model_ids = [models.get(model) if isinstance(models, dict) else models]
+    if action == "podcast":
+        # The script is voiced on the flash TTS model, which has its own bucket
+        voice = MODELS["voice"]
+        model_ids.append(voice.get("flash") if isinstance(voice, dict) else voice)
+    model_ids = [m for m in model_ids if m]
+    if not model_ids:
+        return True
+    wait = max(get_limiter().wait_estimate(m) for m in model_ids)
+    if wait > RATE_LIMIT_MAX_WAIT:
+        remaining = int(wait) + 1
+        msg = f"الخدمة مشغولة حالياً، حاول بعد {remaining} ثانية" if st.session_state.get("ui_lang") == "ar" else f"The service is busy right now. Please try again in {remaining}s"
         st.warning(msg)
         return False
-    st.session_state[key] = now
     return True
 
 # captcha gate (one-time per session)
@@ -128,6 +138,7 @@ T = {
         "prompt_ph_podcast":      "Describe the podcast topic…\ne.g. The economic transformation of Jubail and Yanbu and their role in Vision 2030.\n\nTip: Output follows your interface language. To override, specify in your prompt.",
         "model_label":            "Model",
         "aspect_label":           "Aspect Ratio",
+        "img_variants":           "Variants",
         "duration_label":         "Duration (sec)",
         "total_duration_label":   "Total Duration",
         "total_dur_8":            "8 seconds",
@@ -209,6 +220,14 @@ T = {
         "hist_cleared":           "History cleared.",
         "hist_download":          "Download",
         "hist_view":              "View",
+        "hist_load_more":         "Load more",
+        "hist_search":            "Search history",
+        "hist_search_ph":         "Search prompts and generated text...",
+        "hist_no_results":        "No matching entries.",
+        "job_detached":           "Running in the background — you can leave this page. The result will be saved to History.",
+        "job_busy":               "A generation is already running for this tab.",
+        "new_variation":          "New variation",
+        "new_variation_help":     "Generate a fresh result instead of reusing an identical earlier request.",
     },
     "ar": {
         "app_name":               "مولّد الوسائط",
@@ -237,6 +256,7 @@ T = {
         "prompt_ph_podcast":      "اكتب موضوع البودكاست…\nمثال: التحول الاقتصادي لمدينتي الجبيل وينبع ودورهما في رؤية 2030.\n\nتلميح: المخرجات تتبع لغة الواجهة. للتغيير، حدد في الوصف.",
         "model_label":            "النموذج",
         "aspect_label":           "نسبة الأبعاد",
+        "img_variants":           "عدد النسخ",
         "duration_label":         "المدة (ثانية)",
         "total_duration_label":   "المدة الإجمالية",
         "total_dur_8":            "٨ ثوانٍ",
@@ -316,8 +336,16 @@ T = {
         "hist_confirm_yes":       "نعم، حذف الكل",
         "hist_confirm_no":        "إلغاء",
         "hist_cleared":           "تم مسح السجل.",
+        "hist_load_more":         "عرض المزيد",
+        "hist_search":            "البحث في السجل",
+        "hist_search_ph":         "ابحث في الطلبات والنصوص المُنشأة...",
+        "hist_no_results":        "لا توجد نتائج مطابقة.",
         "hist_download":          "تحميل",
         "hist_view":              "عرض",
+        "job_detached":           "يعمل في الخلفية — يمكنك مغادرة الصفحة. ستُحفظ النتيجة في السجل.",
+        "job_busy":               "هناك عملية إنشاء قيد التنفيذ لهذا التبويب.",
+        "new_variation":          "نسخة جديدة",
+        "new_variation_help":     "إنشاء نتيجة جديدة بدلاً من إعادة استخدام طلب مطابق سابق.",
     },
 }
 
@@ -347,6 +375,23 @@ is_ar   = st.session_state.ui_lang == "ar"
 L       = T[st.session_state.ui_lang]
 _api_ok = has_credentials()
 
+# Re-attach background jobs after a reload
+_JOB_KINDS = ("video", "podcast")
+for _jk in _JOB_KINDS:
+    _qp_job = _qp.get(f"job_{_jk}", "")
+    if _qp_job and re.fullmatch(r"[a-f0-9]{16}", _qp_job) and not st.session_state.get(f"_job_{_jk}"):
+        st.session_state[f"_job_{_jk}"] = _qp_job
+
+
+def _persist_qs() -> str:
+    # Query-string suffix carried across full-page navigation
+    qs = "&_v=1" if st.session_state.get("_captcha_passed") else ""
+    for kind in _JOB_KINDS:
+        job_id = st.session_state.get(f"_job_{kind}")
+        if job_id:
+            qs += f"&job_{kind}={job_id}"
+    return qs
+
 # captcha gate — one-time per session
 if _qp.get("_v") == "1":
     st.session_state["_captcha_passed"] = True
@@ -966,7 +1011,7 @@ lang = st.session_state.ui_lang
 _nl = lang
 
 _other_lang_text = "عربي" if _nl == "en" else "English"
-_vp = "&_v=1" if st.session_state.get("_captcha_passed") else ""
+_vp = _persist_qs()
 _other_lang_href = f"?tab={active_tab}&lang={'ar' if _nl == 'en' else 'en'}{_vp}"
 
 _VISION_LOGO = "https://www.rcjy.gov.sa/documents/d/rcjy-internet/vision_logo"
@@ -974,7 +1019,6 @@ _VISION_LOGO = "https://www.rcjy.gov.sa/documents/d/rcjy-internet/vision_logo"
 
 def _ni(key, label):
     cls = "rcjy-nav-item rcjy-nav-active" if key == active_tab else "rcjy-nav-item"
-    _vp = "&_v=1" if st.session_state.get("_captcha_passed") else ""
     return (f'<li><a href="?tab={key}&lang={_nl}{_vp}" '
             f'class="{cls}" target="_self">{label}</a></li>')
 
@@ -1032,16 +1076,57 @@ def _ctx_widget():
 
 
 def _load_ctx(url, files):
-    ctx, _ = get_content_from_input(text="", url=url, files=files)
-    has_ctx = bool(ctx and ctx != "No content provided.")
+    # Extract once; generators consume the returned ExtractedContent directly
+    ctx = extract_content(text="", url=url, files=files)
+    has_ctx = ctx.has_content
     if has_ctx:
         st.markdown(
-            f'<span class="ctx-badge">✦ {L["context_loaded"]} — {len(ctx):,} {L["chars"]}</span>',
+            f'<span class="ctx-badge">✦ {L["context_loaded"]} — {len(ctx.text):,} {L["chars"]}</span>',
             unsafe_allow_html=True,
         )
     return ctx, has_ctx
 
 
+def _start_job(kind: str, kwargs: dict, history_args: dict):
+    job_id = jobs.submit(kind, kwargs, history_args if _history_ok else None)
+    st.session_state[f"_job_{kind}"] = job_id
+    st.query_params[f"job_{kind}"] = job_id
+
+
+def _clear_job(kind: str):
+    st.session_state.pop(f"_job_{kind}", None)
+    st.session_state.pop(f"_job_segments_{kind}", None)
+    if f"job_{kind}" in st.query_params:
+        del st.query_params[f"job_{kind}"]
+
+
+@st.fragment(run_every=3)
+def _job_status(kind: str, result_key: str, spin_msg: str):
+    # Poll a background job; on completion move the result into session state
+    job_id = st.session_state.get(f"_job_{kind}")
+    job = jobs.get_job(job_id)
+    if jobs.is_active(job):
+        st.info(f"{spin_msg} {job['progress']}".strip())
+        st.caption(L["job_detached"])
+        # Podcast audio is playable segment by segment while the rest is
+        # produced; only segments not fetched yet are read, and a full rerun
+        # draws them below the fragment so polls don't redraw the players
+        shown = st.session_state.setdefault(f"_job_segments_{kind}", [])
+        new_segments = jobs.load_segments(job_id, start=len(shown))
+        if new_segments:
+            shown.extend(new_segments)
+            st.rerun()
+        return
+    _clear_job(kind)
+    if job and job["status"] == jobs.DONE:
+        data, mime = jobs.load_result(job_id)
+        if data:
+            st.session_state[result_key] = (data, mime)
+    elif job:
+        st.session_state[f"_job_error_{kind}"] = job["error"]
+    st.rerun()
+
+
 # tabs
 if active_tab == "text":
     _type_map = {
@@ -1073,29 +1158,33 @@ if active_tab == "text":
             placeholder=L["prompt_ph_text"], height=160,
         )
         input_url, input_files = _ctx_widget()
-        ctx_text, has_ctx = _load_ctx(input_url, input_files)
+        ctx, has_ctx = _load_ctx(input_url, input_files)
 
+    _fresh_text = st.checkbox(L["new_variation"], key="fresh_text", help=L["new_variation_help"])
     if st.button(L["btn_text"], use_container_width=True, key="btn_text"):
         if not text_prompt.strip() and not has_ctx:
             st.warning(L["warn_prompt"])
-        elif not _rate_check("text"):
+        elif not _rate_check("text", text_model):
             pass
         else:
-            with st.spinner(L["spin_text"]):
-                try:
-                    st.session_state.result_text = generate_text(
+            # Render tokens as they arrive; the full text is kept and saved at the end
+            st.session_state.result_text = None
+            try:
+                with st.container(border=True):
+                    _streamed = st.write_stream(generate_text_stream(
                         prompt=text_prompt.strip() or "Summarize the provided content",
-                        context_text=ctx_text if has_ctx else "",
-                        url=input_url or "", files=input_files,
+                        context=ctx,
                         text_type=text_type, tone=text_tone,
-                        model=text_model, lang=lang,
-                    )
-                    if _history_ok:
-                        history.save_entry("text", text_prompt.strip(), st.session_state.result_text,
-                                           "text/plain", {"type": text_type, "tone": text_tone, "model": text_model}, lang)
-                except Exception as e:
-                    logger.exception("Text generation failed")
-                    st.error(_sanitize_error(e))
+                        model=text_model, lang=lang, use_cache=not _fresh_text,
+                    ))
+                st.session_state.result_text = _streamed if isinstance(_streamed, str) else "".join(map(str, _streamed))
+                if _history_ok:
+                    history.save_entry("text", text_prompt.strip(), st.session_state.result_text,
+                                       "text/plain", {"type": text_type, "tone": text_tone, "model": text_model}, lang)
+                st.rerun()
+            except Exception as e:
+                logger.exception("Text generation failed")
+                st.error(_sanitize_error(e))
 
     if st.session_state.result_text:
         with st.container(border=True):
@@ -1108,7 +1197,7 @@ if active_tab == "text":
 # image
 elif active_tab == "image":
     with st.container(border=True):
-        _i1, _i2 = st.columns(2)
+        _i1, _i2, _i3 = st.columns([2, 2, 1])
         with _i1:
             _img_model_map = {
                 L["img_generate_new"]:  "imagen",
@@ -1121,6 +1210,8 @@ elif active_tab == "image":
             )]
         with _i2:
             img_aspect = st.selectbox(L["aspect_label"], ["16:9", "9:16", "1:1", "4:3", "3:4"], key="img_aspect")
+        with _i3:
+            img_variants = st.selectbox(L["img_variants"], [1, 2, 4], key="img_variants")
 
         st.divider()
 
@@ -1129,36 +1220,71 @@ elif active_tab == "image":
             placeholder=L["prompt_ph_image"], height=160,
         )
         input_url, input_files = _ctx_widget()
-        ctx_text, has_ctx = _load_ctx(input_url, input_files)
+        ctx, has_ctx = _load_ctx(input_url, input_files)
 
+    _fresh_img = st.checkbox(L["new_variation"], key="fresh_img", help=L["new_variation_help"])
     if st.button(L["btn_image"], use_container_width=True, key="btn_img"):
         if not img_prompt.strip():
             st.warning(L["warn_prompt"])
-        elif not _rate_check("image"):
+        elif not _rate_check("image", img_model):
             pass
-        else:
+        elif img_variants == 1:
             with st.spinner(L["spin_image"]):
                 try:
                     data, mime = generate_image(
                         prompt=img_prompt.strip(),
-                        context_text=ctx_text if has_ctx else "",
-                        files=input_files, model=img_model,
-                        aspect_ratio=img_aspect, lang=lang,
+                        context_text=ctx.text if has_ctx else "",
+                        context=ctx, model=img_model,
+                        aspect_ratio=img_aspect, lang=lang, use_cache=not _fresh_img,
                     )
-                    st.session_state.result_image = (data, mime)
+                    st.session_state.result_image = [(data, mime)]
                     if _history_ok:
                         history.save_entry("image", img_prompt.strip(), data, mime,
                                            {"model": img_model, "aspect_ratio": img_aspect}, lang)
                 except Exception as e:
                     logger.exception("Image generation failed")
                     st.error(_sanitize_error(e))
+        else:
+            # Gallery: each variant appears in its slot as soon as it arrives
+            _grid = st.columns(2)
+            _slots = [_grid[i % 2].empty() for i in range(img_variants)]
+            _images = []
+            with st.spinner(L["spin_image"]):
+                try:
+                    for data, mime in generate_image_variants(
+                        prompt=img_prompt.strip(),
+                        context_text=ctx.text if has_ctx else "",
+                        context=ctx, model=img_model,
+                        aspect_ratio=img_aspect, lang=lang, n=img_variants,
+                    ):
+                        _slots[len(_images)].image(data, width="stretch")
+                        _images.append((data, mime))
+                except Exception as e:
+                    logger.exception("Image generation failed")
+                    st.error(_sanitize_error(e))
+            for _slot in _slots:
+                _slot.empty()
+            if _images:
+                st.session_state.result_image = _images
+                if _history_ok:
+                    _settings = {"model": img_model, "aspect_ratio": img_aspect, "variants": img_variants}
+                    history.save_entries([
+                        {"content_type": "image", "prompt": img_prompt.strip(), "data": data,
+                         "mime": mime, "settings": _settings, "lang": lang}
+                        for data, mime in _images
+                    ])
 
     if st.session_state.result_image:
-        st.image(st.session_state.result_image[0], width="stretch")
-        st.download_button(
-            L["btn_download"], data=st.session_state.result_image[0],
-            file_name="rcjy_image.png", mime="image/png", key="dl_img",
-        )
+        _results = st.session_state.result_image
+        _cols = st.columns(2) if len(_results) > 1 else [st.container()]
+        for _n, (_data, _mime) in enumerate(_results):
+            with _cols[_n % len(_cols)]:
+                st.image(_data, width="stretch")
+                st.download_button(
+                    L["btn_download"], data=_data,
+                    file_name=f"rcjy_image_{_n + 1}.png" if len(_results) > 1 else "rcjy_image.png",
+                    mime=_mime, key=f"dl_img_{_n}",
+                )
 
 # video
 elif active_tab == "video":
@@ -1211,40 +1337,34 @@ elif active_tab == "video":
             placeholder=L["prompt_ph_video"], height=160,
         )
         input_url, input_files = _ctx_widget()
-        ctx_text, has_ctx = _load_ctx(input_url, input_files)
+        ctx, has_ctx = _load_ctx(input_url, input_files)
 
     if st.button(L["btn_video"], use_container_width=True, key="btn_vid"):
         if not vid_prompt.strip():
             st.warning(L["warn_prompt"])
-        elif not _rate_check("video"):
+        elif not _rate_check("video", vid_model):
             pass
+        elif st.session_state.get("_job_video"):
+            st.warning(L["job_busy"])
         else:
-            _spin_msg = L["spin_video_extend"] if vid_extend > 0 else L["spin_video"]
-            # Progress placeholder
-            _progress_placeholder = st.empty()
+            _start_job(
+                "video",
+                dict(
+                    prompt=vid_prompt.strip(),
+                    context_text=ctx.text if has_ctx else "",
+                    aspect_ratio=vid_aspect, duration="8",
+                    resolution=vid_res.lower(), model=vid_model, lang=lang,
+                    extend_seconds=vid_extend,
+                ),
+                {"prompt": vid_prompt.strip(), "lang": lang,
+                 "settings": {"model": vid_model, "aspect_ratio": vid_aspect, "resolution": vid_res, "extend_seconds": vid_extend}},
+            )
 
-            def _vid_progress(msg: str):
-                _progress_placeholder.info(msg)
-
-            with st.spinner(_spin_msg):
-                try:
-                    data, mime = generate_video(
-                        prompt=vid_prompt.strip(),
-                        context_text=ctx_text if has_ctx else "",
-                        aspect_ratio=vid_aspect, duration="8",
-                        resolution=vid_res.lower(), model=vid_model, lang=lang,
-                        extend_seconds=vid_extend,
-                        progress_callback=_vid_progress if vid_extend > 0 else None,
-                    )
-                    st.session_state.result_video = (data, mime)
-                    if _history_ok:
-                        history.save_entry("video", vid_prompt.strip(), data, mime,
-                                           {"model": vid_model, "aspect_ratio": vid_aspect, "resolution": vid_res, "extend_seconds": vid_extend}, lang)
-                    _progress_placeholder.empty()
-                except Exception as e:
-                    logger.exception("Video generation failed")
-                    _progress_placeholder.empty()
-                    st.error(_sanitize_error(e))
+    if st.session_state.get("_job_video"):
+        _job_status("video", "result_video",
+                    L["spin_video_extend"] if vid_extend > 0 else L["spin_video"])
+    if st.session_state.get("_job_error_video"):
+        st.error(st.session_state.pop("_job_error_video"))
 
     if st.session_state.result_video:
         st.video(st.session_state.result_video[0])
@@ -1307,22 +1427,23 @@ elif active_tab == "voice":
             placeholder=L["prompt_ph_voice"], height=200,
         )
         input_url, input_files = _ctx_widget()
-        ctx_text, has_ctx = _load_ctx(input_url, input_files)
+        ctx, has_ctx = _load_ctx(input_url, input_files)
 
+    _fresh_voice = st.checkbox(L["new_variation"], key="fresh_voice", help=L["new_variation_help"])
     if st.button(L["btn_voice"], use_container_width=True, key="btn_voice"):
         if not voice_prompt.strip() and not has_ctx:
             st.warning(L["warn_text"])
-        elif not _rate_check("voice"):
+        elif not _rate_check("voice", "pro"):
             pass
         else:
             with st.spinner(L["spin_voice"]):
                 try:
                     data, mime = generate_voice(
-                        text=voice_prompt.strip(), context_text=ctx_text if has_ctx else "",
+                        text=voice_prompt.strip(), context_text=ctx.text if has_ctx else "",
                         voice_name=voice_name, display_name=_voice_display if is_ar else "",
                         style_hint=style_hint,
                         tts_model="pro",
-                        lang=lang,
+                        lang=lang, use_cache=not _fresh_voice,
                     )
                     st.session_state.result_voice = (data, mime)
                     if _history_ok:
@@ -1389,35 +1510,40 @@ elif active_tab == "podcast":
             placeholder=L["prompt_ph_podcast"], height=160,
         )
         input_url, input_files = _ctx_widget()
-        ctx_text, has_ctx = _load_ctx(input_url, input_files)
+        ctx, has_ctx = _load_ctx(input_url, input_files)
 
     if st.button(L["btn_podcast"], use_container_width=True, key="btn_pod"):
         if not pod_prompt.strip() and not has_ctx:
             st.warning(L["warn_topic"])
         elif not _rate_check("podcast"):
             pass
+        elif st.session_state.get("_job_podcast"):
+            st.warning(L["job_busy"])
         else:
-            with st.spinner(L["spin_podcast"]):
-                try:
-                    data, mime = generate_podcast(
-                        prompt=pod_prompt.strip() or (
-                            "ناقش المحتوى المقدّم" if lang == "ar" else "Discuss the provided content"
-                        ),
-                        context_text=ctx_text if has_ctx else "",
-                        url=input_url or "", files=input_files,
-                        length="short" if pod_len_idx == 0 else "standard",
-                        voice_host=pod_host, voice_guest=pod_guest,
-                        host_display_name=_host_disp if is_ar else "",
-                        guest_display_name=_guest_disp if is_ar else "",
-                        lang=lang,
-                    )
-                    st.session_state.result_podcast = (data, mime)
-                    if _history_ok:
-                        history.save_entry("podcast", pod_prompt.strip(), data, mime,
-                                           {"length": "short" if pod_len_idx == 0 else "standard", "host": pod_host, "guest": pod_guest}, lang)
-                except Exception as e:
-                    logger.exception("Podcast generation failed")
-                    st.error(_sanitize_error(e))
+            _pod_length = "short" if pod_len_idx == 0 else "standard"
+            _start_job(
+                "podcast",
+                dict(
+                    prompt=pod_prompt.strip() or (
+                        "ناقش المحتوى المقدّم" if lang == "ar" else "Discuss the provided content"
+                    ),
+                    context=ctx,
+                    length=_pod_length,
+                    voice_host=pod_host, voice_guest=pod_guest,
+                    host_display_name=_host_disp if is_ar else "",
+                    guest_display_name=_guest_disp if is_ar else "",
+                    lang=lang,
+                ),
+                {"prompt": pod_prompt.strip(), "lang": lang,
+                 "settings": {"length": _pod_length, "host": pod_host, "guest": pod_guest}},
+            )
+
+    if st.session_state.get("_job_podcast"):
+        _job_status("podcast", "result_podcast", L["spin_podcast"])
+        for _seg in st.session_state.get("_job_segments_podcast", []):
+            st.audio(_seg, format="audio/wav")
+    if st.session_state.get("_job_error_podcast"):
+        st.error(st.session_state.pop("_job_error_podcast"))
 
     if st.session_state.result_podcast:
         st.audio(st.session_state.result_podcast[0], format="audio/wav")
@@ -1440,34 +1566,52 @@ elif active_tab == "history":
                 history.delete_entry(_del_id)
                 st.rerun()
 
-            # Pending view
+            # Pending view — media streams from a signed URL when available,
+            # otherwise from a temp file rather than an in-memory copy
             if st.session_state.get("_hist_view_id"):
                 _view_id = st.session_state.pop("_hist_view_id")
-                _view_data, _view_mime, _view_name = history.load_file(_view_id)
-                if _view_data:
-                    st.subheader(_view_name)
-                    if _view_mime and _view_mime.startswith("image/"):
-                        st.image(_view_data, width="stretch")
-                    elif _view_mime and _view_mime.startswith("video/"):
-                        st.video(_view_data, format=_view_mime)
-                    elif _view_mime and _view_mime.startswith("audio/"):
-                        st.audio(_view_data, format=_view_mime)
-                    elif _view_mime and _view_mime.startswith("text/"):
-                        st.markdown(_view_data if isinstance(_view_data, str) else _view_data.decode("utf-8", errors="ignore"))
-                    else:
-                        st.info(f"Preview not available for {_view_mime}")
-                    st.divider()
+                _view_data, _view_mime, _view_name = history.get_file_url(_view_id)
+                _view_path = None
+                if not _view_data or (_view_mime or "").startswith("text/"):
+                    _view_path, _view_mime, _view_name = history.load_file_to_path(_view_id)
+                    _view_data = _view_path
+                try:
+                    if _view_data:
+                        st.subheader(_view_name)
+                        if _view_mime and _view_mime.startswith("image/"):
+                            st.image(_view_data, width="stretch")
+                        elif _view_mime and _view_mime.startswith("video/"):
+                            st.video(_view_data, format=_view_mime)
+                        elif _view_mime and _view_mime.startswith("audio/"):
+                            st.audio(_view_data, format=_view_mime)
+                        elif _view_mime and _view_mime.startswith("text/"):
+                            with open(_view_path, encoding="utf-8", errors="ignore") as _view_file:
+                                st.markdown(_view_file.read())
+                        else:
+                            st.info(f"Preview not available for {_view_mime}")
+                        st.divider()
+                finally:
+                    if _view_path:
+                        os.remove(_view_path)
 
             # Pending download
             if st.session_state.get("_hist_download_id"):
                 _dl_id = st.session_state.pop("_hist_download_id")
-                _dl_data, _dl_mime, _dl_name = history.load_file(_dl_id)
-                if _dl_data:
-                    st.download_button(
-                        f"⬇ {_dl_name}", data=_dl_data,
-                        file_name=_dl_name, mime=_dl_mime,
-                        key=f"dl_actual_{_dl_id}",
-                    )
+                _dl_url, _dl_mime, _dl_name = history.get_file_url(_dl_id, download=True)
+                if _dl_url:
+                    st.link_button(f"⬇ {_dl_name}", _dl_url)
+                else:
+                    _dl_path, _dl_mime, _dl_name = history.load_file_to_path(_dl_id)
+                    if _dl_path:
+                        try:
+                            with open(_dl_path, "rb") as _dl_file:
+                                st.download_button(
+                                    f"⬇ {_dl_name}", data=_dl_file,
+                                    file_name=_dl_name, mime=_dl_mime,
+                                    key=f"dl_actual_{_dl_id}",
+                                )
+                        finally:
+                            os.remove(_dl_path)
 
             _stats = history.get_stats()
 
@@ -1494,10 +1638,29 @@ elif active_tab == "history":
                     unsafe_allow_html=True,
                 )
 
+            _query = st.text_input(L["hist_search"], placeholder=L["hist_search_ph"],
+                                   key="hist_search_q", max_chars=200).strip()
+
             st.divider()
 
-            _entries = history.get_entries(content_type=_filter_type, limit=50)
-            if not _entries:
+            _entries, _next_cursor = [], None
+            if _query:
+                _entries = history.search(_query, content_type=_filter_type)
+            else:
+                # Keyset pagination: one cursor per loaded page, reset on filter change
+                if st.session_state.get("_hist_page_filter", "") != _filter_type:
+                    st.session_state["_hist_page_filter"] = _filter_type
+                    st.session_state["_hist_cursors"] = [None]
+                for _cursor in st.session_state.get("_hist_cursors", [None]):
+                    _page, _next_cursor = history.get_page(
+                        content_type=_filter_type, limit=_HIST_PAGE_SIZE, after=_cursor,
+                    )
+                    _entries.extend(_page)
+                    if not _next_cursor:
+                        break
+            if _query and not _entries:
+                st.info(L["hist_no_results"])
+            elif not _entries:
                 st.markdown(
                     f'<div class="hist-empty">'
                     f'<div class="hist-empty-icon">'
@@ -1538,6 +1701,11 @@ elif active_tab == "history":
                         unsafe_allow_html=True,
                     )
                     _hc1, _hc2, _hc3, _hc4 = st.columns([4, 2, 2, 2])
+                    if _e.get("thumb"):
+                        _thumb, _ = history.load_thumbnail(_eid)
+                        if _thumb:
+                            with _hc1:
+                                st.image(_thumb, width=160)
                     with _hc2:
                         st.button(L["hist_view"], key=f"view_{_eid}", use_container_width=True,
                                   on_click=lambda eid=_eid: st.session_state.update({"_hist_view_id": eid}))
@@ -1549,6 +1717,10 @@ elif active_tab == "history":
                                   on_click=lambda eid=_eid: st.session_state.update({"_hist_delete_id": eid}))
                     st.markdown('<hr class="hist-sep">', unsafe_allow_html=True)
 
+                if _next_cursor:
+                    st.button(L["hist_load_more"], key="hist_load_more",
+                              on_click=lambda c=_next_cursor: st.session_state["_hist_cursors"].append(c))
+
                 # Clear
                 if st.button(L["hist_clear"], key="hist_clear_btn"):
                     st.session_state["_hist_confirm_clear"] = True
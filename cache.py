@@ -0,0 +1,178 @@
+# Small in-process caches shared across Streamlit sessions, and a size-bounded
+# on-disk LRU directory for caches that should survive restarts
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+
+def _default_size(value) -> int:
+    # Approximate memory footprint of a cached value
+    if isinstance(value, (str, bytes, bytearray)):
+        return len(value)
+    if isinstance(value, (list, tuple)):
+        return sum(_default_size(v) for v in value)
+    return 1
+
+
+class LRUCache:
+    # Thread-safe LRU cache bounded by entry count and approximate size,
+    # with optional per-entry TTL and hit/miss counters
+
+    def __init__(self, max_entries: int = 128, max_size: int = 0, ttl: float = 0, sizeof=_default_size):
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.ttl = ttl
+        self._sizeof = sizeof
+        self._data: OrderedDict = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            value, size, expires = item
+            if expires and expires < time.monotonic():
+                self._pop(key)
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl: float = None):
+        size = self._sizeof(value)
+        ttl = self.ttl if ttl is None else ttl
+        expires = time.monotonic() + ttl if ttl else 0
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            if self.max_size and size > self.max_size:
+                return
+            self._data[key] = (value, size, expires)
+            self._size += size
+            while self._data and (
+                len(self._data) > self.max_entries
+                or (self.max_size and self._size > self.max_size)
+            ):
+                oldest = next(iter(self._data))
+                self._pop(oldest)
+                self.evictions += 1
+
+    def get_or_set(self, key, compute):
+        # Return cached value or compute and store it (compute runs unlocked)
+        _missing = object()
+        value = self.get(key, _missing)
+        if value is not _missing:
+            return value
+        value = compute()
+        self.set(key, value)
+        return value
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._size = 0
+
+    def _pop(self, key):
+        _, size, _ = self._data.pop(key)
+        self._size -= size
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "size": self._size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+class DiskLRU:
+    # One file per key under root, bounded by total size. Writes are atomic
+    # (temp file + rename) so workers on one host can share the directory;
+    # touch() marks a file recently used and the oldest mtimes go first.
+
+    def __init__(self, root: Path, max_size: int, suffix: str = ".bin"):
+        self.root = root
+        self.max_size = max_size
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        root.mkdir(parents=True, exist_ok=True)
+
+    def path(self, key: str) -> Path:
+        return self.root / f"{key}{self.suffix}"
+
+    def read(self, key: str) -> Optional[bytes]:
+        try:
+            return self.path(key).read_bytes()
+        except OSError:
+            return None
+
+    def touch(self, key: str):
+        try:
+            os.utime(self.path(key))
+        except OSError:
+            pass
+
+    def write(self, key: str, data: bytes) -> bool:
+        # False when the value is too large or the write failed
+        if len(data) > self.max_size:
+            return False
+        path = self.path(key)
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        try:
+            tmp.write_bytes(data)
+            tmp.replace(path)
+        except OSError:
+            self._unlink(tmp)
+            return False
+        self._evict()
+        return True
+
+    def delete(self, key: str):
+        self._unlink(self.path(key))
+
+    def clear(self):
+        for path in self.root.glob(f"*{self.suffix}"):
+            self._unlink(path)
+
+    def _evict(self):
+        with self._lock:
+            try:
+                files = [(p, p.stat()) for p in self.root.glob(f"*{self.suffix}")]
+            except OSError:
+                return
+            total = sum(st.st_size for _, st in files)
+            for path, st in sorted(files, key=lambda item: item[1].st_mtime):
+                if total <= self.max_size:
+                    break
+                self._unlink(path)
+                total -= st.st_size
+
+    @staticmethod
+    def _unlink(path: Path):
+        try:
+            path.unlink()
+        except OSError:
+            pass
@@ -1,24 +1,57 @@
 import csv
+import hashlib
 import io
 import ipaddress
 import logging
+import multiprocessing
+import os
 import re
+import shutil
 import socket
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
 from pathlib import Path
-from typing import Optional
-from urllib.parse import urlparse
+from typing import Iterable, Iterator, NamedTuple, Optional
+from urllib.parse import urljoin, urlparse
 
 import requests
 from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
 from PIL import Image
 
+from cache import LRUCache
+from url_cache import UrlCache
+
 logger = logging.getLogger("rcjy.content_extractor")
 
 # SSRF limits
 _ALLOWED_SCHEMES = {"http", "https"}
 _MAX_URL_RESPONSE_BYTES = 10 * 1024 * 1024  # 10 MB max download from URL
 _URL_REQUEST_TIMEOUT = 15  # seconds
+_MAX_URL_REDIRECTS = 5
+_URL_USER_AGENT = "Mozilla/5.0 (compatible; RCJY-MediaBot/1.0)"
 _MAX_FILE_SIZE = 50 * 1024 * 1024  # 50 MB per uploaded file
+_MAX_DOC_CHARS = 50000  # text kept per document
+
+# Parallel document extraction
+_EXTRACT_WORKERS = 4
+_EXTRACT_PROCESSES = 2
+_EXTRACT_TIMEOUT = 60  # seconds per file, counted from submission
+_PROCESS_SUFFIXES = {".pdf"}  # CPU-bound parsers run in worker processes (no GIL contention)
+
+# Extraction caches (process-wide, shared by all sessions)
+_URL_CACHE_TTL = 300  # seconds
+_url_cache = LRUCache(max_entries=64, max_size=8 * 1024 * 1024, ttl=_URL_CACHE_TTL)
+_file_cache = LRUCache(max_entries=256, max_size=32 * 1024 * 1024)
+# Cleaned page text with its ETag/Last-Modified, revalidated on later fetches
+_url_disk_cache = UrlCache()
+# Validated DNS answers. getaddrinfo does not expose record TTLs, so a short
+# fixed TTL stands in for them; only answers that passed the SSRF check are kept.
+_DNS_CACHE_TTL = 60  # seconds
+_dns_cache = LRUCache(max_entries=256, ttl=_DNS_CACHE_TTL)
 
 
 _BLOCKED_HOSTS = {
@@ -49,6 +82,9 @@ def _resolve_and_validate(hostname: str) -> str:
     # Resolve hostname once and return a safe IP, or raise ValueError
     if hostname.lower() in _BLOCKED_HOSTS:
         raise ValueError("Access to cloud metadata endpoints is not allowed.")
+    cached = _dns_cache.get(hostname.lower())
+    if cached is not None:
+        return cached
     try:
         infos = socket.getaddrinfo(hostname, None, socket.AF_UNSPEC, socket.SOCK_STREAM)
     except (socket.gaierror, OSError):
@@ -56,6 +92,7 @@ def _resolve_and_validate(hostname: str) -> str:
     for info in infos:
         ip_str = info[4][0]
         if _is_safe_ip(ip_str):
+            _dns_cache.set(hostname.lower(), ip_str)
             return ip_str
     raise ValueError("URLs pointing to internal/private network addresses are not allowed.")
 
@@ -127,6 +164,72 @@ def is_video(filename: str) -> bool:
     return get_mime_type(filename).startswith("video/")
 
 
+class _PinnedHostAdapter(HTTPAdapter):
+    # Requests go to the validated IP written into the URL; the Host header
+    # carries the real hostname. For HTTPS that hostname is used for SNI and
+    # certificate verification, and it is part of the pool key, so each
+    # (IP, port, hostname) gets its own pool of kept-alive connections.
+
+    def build_connection_pool_key_attributes(self, request, verify, cert=None):
+        host_params, pool_kwargs = super().build_connection_pool_key_attributes(request, verify, cert)
+        hostname = request.headers.get("Host")
+        if hostname and host_params["scheme"] == "https":
+            pool_kwargs["server_hostname"] = hostname
+            pool_kwargs["assert_hostname"] = hostname
+        return host_params, pool_kwargs
+
+
+# One adapter (and so one connection pool) for the process; Session objects
+# are not thread-safe, so each thread gets its own session on top of it
+_url_adapter = _PinnedHostAdapter(pool_connections=16, pool_maxsize=16, max_retries=0)
+_url_sessions = threading.local()
+
+
+def _url_session() -> requests.Session:
+    session = getattr(_url_sessions, "session", None)
+    if session is None:
+        session = requests.Session()
+        session.trust_env = False  # proxies would bypass the IP pinning
+        session.headers["User-Agent"] = _URL_USER_AGENT
+        session.mount("http://", _url_adapter)
+        session.mount("https://", _url_adapter)
+        _url_sessions.session = session
+    return session
+
+
+def _pinned_get(session: requests.Session, url: str, resolved_ip: str, headers: Optional[dict] = None) -> requests.Response:
+    # GET url on its pre-validated IP without following redirects
+    parsed = urlparse(url)
+    hostname = parsed.hostname
+    ip_host = f"[{resolved_ip}]" if ":" in resolved_ip else resolved_ip
+    netloc = ip_host if parsed.port is None else f"{ip_host}:{parsed.port}"
+    pinned_url = parsed._replace(netloc=netloc).geturl()
+    return session.get(
+        pinned_url,
+        headers={**(headers or {}), "Host": hostname},
+        timeout=_URL_REQUEST_TIMEOUT,
+        allow_redirects=False,
+        stream=True,
+    )
+
+
+def _release(response: requests.Response, drain: bool = True):
+    # Hand the connection back to the pool. A small unread body (redirects)
+    # is drained so the socket can be reused; otherwise it is closed.
+    try:
+        length = int(response.headers.get("Content-Length") or -1)
+    except ValueError:
+        length = -1
+    if drain and 0 <= length <= 64 * 1024:
+        try:
+            response.raw.drain_conn()
+            response.raw.release_conn()
+            return
+        except Exception:
+            pass
+    response.close()
+
+
 def extract_from_url(url: str, max_chars: int = 50000) -> str:
     try:
         url, resolved_ip = _validate_url(url)
@@ -134,60 +237,43 @@ def extract_from_url(url: str, max_chars: int = 50000) -> str:
         logger.warning("URL validation failed for user-supplied URL: %s", e)
         return f"Invalid URL: {e}"
 
-    try:
-        # Pin the resolved IP to prevent DNS rebinding (TOCTOU)
-        parsed = urlparse(url)
-        hostname = parsed.hostname
-        port = parsed.port or (443 if parsed.scheme == "https" else 80)
-        pinned_url = url.replace(f"://{hostname}", f"://{resolved_ip}", 1)
-
-        headers = {
-            "User-Agent": "Mozilla/5.0 (compatible; RCJY-MediaBot/1.0)",
-            "Host": hostname,
-        }
-        session = requests.Session()
-        session.max_redirects = 5
-        # Disable redirects to validate each hop
-        response = session.get(
-            pinned_url,
-            headers=headers,
-            timeout=_URL_REQUEST_TIMEOUT,
-            allow_redirects=False,
-            stream=True,
-            verify=True if parsed.scheme == "https" else False,
-        )
+    requested_url = url
+    cached = _url_disk_cache.get(requested_url, max_chars)
 
-        # Follow redirects manually with validation
+    try:
+        # Pin the resolved IP to prevent DNS rebinding (TOCTOU); redirects are
+        # followed by hand so every hop is validated the same way
+        session = _url_session()
+        conditional = UrlCache.conditional_headers(cached, url)
+        response = _pinned_get(session, url, resolved_ip, conditional)
         redirect_count = 0
-        while response.is_redirect and redirect_count < 5:
+        while response.is_redirect and redirect_count < _MAX_URL_REDIRECTS:
             redirect_count += 1
-            next_url = response.headers.get("Location", "")
-            if not next_url:
+            location = response.headers.get("Location", "")
+            if not location:
                 break
-            # Resolve absolute URL
-            if not next_url.startswith("http"):
-                next_url = f"{parsed.scheme}://{hostname}{next_url}"
+            _release(response)
+            next_url = urljoin(url, location)
             try:
-                next_url, next_ip = _validate_url(next_url)
+                url, resolved_ip = _validate_url(next_url)
             except ValueError:
                 logger.warning("Redirect to blocked destination: %s", next_url)
                 return "Error: URL redirected to a blocked destination."
-            next_parsed = urlparse(next_url)
-            next_host = next_parsed.hostname
-            pinned_next = next_url.replace(f"://{next_host}", f"://{next_ip}", 1)
-            response = session.get(
-                pinned_next,
-                headers={"User-Agent": headers["User-Agent"], "Host": next_host},
-                timeout=_URL_REQUEST_TIMEOUT,
-                allow_redirects=False,
-                stream=True,
-            )
+            conditional = UrlCache.conditional_headers(cached, url)
+            response = _pinned_get(session, url, resolved_ip, conditional)
+
+        if response.status_code == 304 and conditional:
+            _release(response)
+            return _url_disk_cache.not_modified(requested_url, max_chars, cached)
 
+        if not response.ok:
+            _release(response)
         response.raise_for_status()
 
         # Check Content-Length
         content_length = response.headers.get("Content-Length")
         if content_length and int(content_length) > _MAX_URL_RESPONSE_BYTES:
+            _release(response, drain=False)
             return "Error: URL response exceeds maximum allowed size (10 MB)."
 
         # Read with size limit
@@ -197,6 +283,7 @@ def extract_from_url(url: str, max_chars: int = 50000) -> str:
             total += len(chunk)
             if total > _MAX_URL_RESPONSE_BYTES:
                 logger.warning("URL response exceeded size limit, truncating")
+                _release(response, drain=False)
                 break
             chunks.append(chunk)
         raw_content = b"".join(chunks)
@@ -209,7 +296,15 @@ def extract_from_url(url: str, max_chars: int = 50000) -> str:
         text = re.sub(r"\n{3,}", "\n\n", text)
         if len(text) > max_chars:
             text = text[:max_chars] + "\n\n[Content truncated...]"
-        return text.strip() or "Could not extract text from URL."
+        text = text.strip()
+        if not text:
+            return "Could not extract text from URL."
+        _url_disk_cache.set(
+            requested_url, max_chars, text,
+            response.headers.get("ETag"), response.headers.get("Last-Modified"),
+            validated_url=url,
+        )
+        return text
     except requests.exceptions.Timeout:
         return "Error: URL request timed out."
     except requests.exceptions.ConnectionError:
@@ -222,73 +317,128 @@ def extract_from_url(url: str, max_chars: int = 50000) -> str:
         return "Error: Could not fetch content from URL."
 
 
-def extract_from_pdf(file) -> str:
+def _take_chars(pieces: Iterable[str], max_chars: int, sep: str = "\n\n") -> tuple[str, int]:
+    # Join non-empty pieces until max_chars is reached, without pulling any
+    # further from the iterable, so lazy producers stop there too.
+    # Returns (text, number of pieces consumed).
+    out, size, consumed = [], 0, 0
+    for piece in pieces:
+        consumed += 1
+        if not piece:
+            continue
+        out.append(piece)
+        size += len(piece) + len(sep)
+        if size >= max_chars:
+            break
+    return sep.join(out)[:max_chars], consumed
+
+
+def iter_pdf_pages(reader, first_page: int = 1, last_page: Optional[int] = None) -> Iterator[tuple[int, str]]:
+    # Lazily yield (page number, text) for pages first_page..last_page
+    # (1-based, inclusive, clamped to the document). Each page is parsed once,
+    # when it is reached.
+    end = len(reader.pages) if last_page is None else min(last_page, len(reader.pages))
+    for number in range(max(1, first_page), end + 1):
+        yield number, (reader.pages[number - 1].extract_text() or "").strip()
+
+
+def extract_from_pdf(file, max_chars: int = _MAX_DOC_CHARS, first_page: int = 1, last_page: Optional[int] = None) -> str:
+    # Pages are read only until max_chars is met; if that leaves pages of
+    # the range unread, the text says how many were read
     if PdfReader is None:
         return "Error: PDF reader not available."
     try:
         reader = PdfReader(file)
-        parts = [page.extract_text() for page in reader.pages if page.extract_text()]
-        return "\n\n".join(parts)[:50000] or "No text found in PDF."
+        total = len(reader.pages)
+        in_range = max(0, (total if last_page is None else min(last_page, total)) - max(1, first_page) + 1)
+        text, pages_read = _take_chars((t for _, t in iter_pdf_pages(reader, first_page, last_page)), max_chars)
+        if not text:
+            return "No text found in PDF."
+        if pages_read < in_range:
+            logger.info("PDF text budget reached after %d of %d pages", pages_read, in_range)
+            text += f"\n\n[Read {pages_read} of {in_range} pages]"
+        return text
     except Exception:
         logger.exception("Error reading PDF")
         return "Error: Could not read PDF file."
 
 
-def extract_from_docx(file) -> str:
+def _docx_paragraphs(doc) -> Iterator[str]:
+    # Body paragraphs in document order, built one at a time instead of
+    # materializing doc.paragraphs
+    from docx.oxml.ns import qn
+    from docx.text.paragraph import Paragraph
+    for p in doc.element.body.iterchildren(qn("w:p")):
+        text = Paragraph(p, doc).text
+        if text.strip():
+            yield text
+
+
+def extract_from_docx(file, max_chars: int = _MAX_DOC_CHARS) -> str:
     if DocxDocument is None:
         return "Error: DOCX reader not available."
     try:
         doc = DocxDocument(file)
-        return "\n\n".join(p.text for p in doc.paragraphs if p.text.strip())[:50000] or "No text found."
+        text, _ = _take_chars(_docx_paragraphs(doc), max_chars)
+        return text or "No text found."
     except Exception:
         logger.exception("Error reading DOCX")
         return "Error: Could not read DOCX file."
 
 
-def extract_from_txt(file) -> str:
+def extract_from_txt(file, max_chars: int = _MAX_DOC_CHARS) -> str:
+    # A UTF-8 character is at most 4 bytes, so this is all that can be kept
     try:
-        content = file.read()
+        content = file.read(max_chars * 4)
         if isinstance(content, bytes):
             content = content.decode("utf-8", errors="ignore")
-        return content[:50000]
+        return content[:max_chars]
     except Exception:
         logger.exception("Error reading text file")
         return "Error: Could not read text file."
 
 
-def extract_from_csv(file) -> str:
+def _csv_rows(file, max_rows: int) -> Iterator[str]:
+    # Decode and parse incrementally; nothing past the last row used is read
+    stream = file if isinstance(file, io.TextIOBase) else io.TextIOWrapper(file, encoding="utf-8", errors="ignore", newline="")
     try:
-        content = file.read()
-        if isinstance(content, bytes):
-            content = content.decode("utf-8", errors="ignore")
-        reader = csv.reader(io.StringIO(content))
-        rows = []
-        for i, row in enumerate(reader):
-            if i > 500:
-                rows.append("[... truncated ...]")
-                break
-            rows.append(" | ".join(row))
-        return "\n".join(rows)[:50000]
+        for i, row in enumerate(csv.reader(stream)):
+            if i > max_rows:
+                yield "[... truncated ...]"
+                return
+            yield " | ".join(row)
+    finally:
+        if stream is not file:
+            stream.detach()  # leave the caller's file open
+
+
+def extract_from_csv(file, max_chars: int = _MAX_DOC_CHARS) -> str:
+    try:
+        text, _ = _take_chars(_csv_rows(file, 500), max_chars, sep="\n")
+        return text
     except Exception:
         logger.exception("Error reading CSV")
         return "Error: Could not read CSV file."
 
 
-def extract_from_pptx(file) -> str:
+def _pptx_slides(prs) -> Iterator[str]:
+    for i, slide in enumerate(prs.slides, 1):
+        slide_text = []
+        for shape in slide.shapes:
+            if shape.has_text_frame:
+                for para in shape.text_frame.paragraphs:
+                    if para.text.strip():
+                        slide_text.append(para.text.strip())
+        if slide_text:
+            yield f"[Slide {i}]\n" + "\n".join(slide_text)
+
+
+def extract_from_pptx(file, max_chars: int = _MAX_DOC_CHARS) -> str:
     try:
         from pptx import Presentation
         prs = Presentation(file)
-        parts = []
-        for i, slide in enumerate(prs.slides, 1):
-            slide_text = []
-            for shape in slide.shapes:
-                if shape.has_text_frame:
-                    for para in shape.text_frame.paragraphs:
-                        if para.text.strip():
-                            slide_text.append(para.text.strip())
-            if slide_text:
-                parts.append(f"[Slide {i}]\n" + "\n".join(slide_text))
-        return "\n\n".join(parts)[:50000] or "No text found in presentation."
+        text, _ = _take_chars(_pptx_slides(prs), max_chars)
+        return text or "No text found in presentation."
     except ImportError:
         return "Error: PPTX reader not available."
     except Exception:
@@ -296,21 +446,32 @@ def extract_from_pptx(file) -> str:
         return "Error: Could not read PPTX file."
 
 
-def extract_from_xlsx(file) -> str:
+def _xlsx_lines(wb, max_rows: int) -> Iterator[str]:
+    # Non-empty rows as lines; each sheet starts with its name and sheets
+    # are separated by a blank line
+    first_sheet = True
+    for ws in wb.worksheets:
+        header = f"[Sheet: {ws.title}]" if first_sheet else f"\n[Sheet: {ws.title}]"
+        for row in ws.iter_rows(max_row=max_rows, values_only=True):
+            cells = [str(c) if c is not None else "" for c in row]
+            if any(cells):
+                if header:
+                    yield header
+                    header, first_sheet = None, False
+                yield " | ".join(cells)
+
+
+def extract_from_xlsx(file, max_chars: int = _MAX_DOC_CHARS) -> str:
+    # read_only streams rows from the sheet XML instead of loading the
+    # whole workbook into memory
     try:
         import openpyxl
-        wb = openpyxl.load_workbook(file, data_only=True)
-        parts = []
-        for sheet_name in wb.sheetnames:
-            ws = wb[sheet_name]
-            rows = []
-            for row in ws.iter_rows(max_row=200, values_only=True):
-                cells = [str(c) if c is not None else "" for c in row]
-                if any(cells):
-                    rows.append(" | ".join(cells))
-            if rows:
-                parts.append(f"[Sheet: {sheet_name}]\n" + "\n".join(rows))
-        return "\n\n".join(parts)[:50000] or "No data found in spreadsheet."
+        wb = openpyxl.load_workbook(file, read_only=True, data_only=True)
+        try:
+            text, _ = _take_chars(_xlsx_lines(wb, 200), max_chars, sep="\n")
+        finally:
+            wb.close()
+        return text or "No data found in spreadsheet."
     except ImportError:
         return "Error: Excel reader not available."
     except Exception:
@@ -318,11 +479,187 @@ def extract_from_xlsx(file) -> str:
         return "Error: Could not read Excel file."
 
 
-def get_content_from_input(
+# suffix -> (label, extractor, keep raw file as attachment)
+_DOC_EXTRACTORS = {
+    ".pdf": ("PDF", extract_from_pdf, True),
+    ".docx": ("Document", extract_from_docx, True),
+    ".doc": ("Document", extract_from_docx, True),
+    ".pptx": ("Presentation", extract_from_pptx, True),
+    ".ppt": ("Presentation", extract_from_pptx, True),
+    ".xlsx": ("Spreadsheet", extract_from_xlsx, True),
+    ".xls": ("Spreadsheet", extract_from_xlsx, True),
+    ".csv": ("CSV", extract_from_csv, False),
+    ".txt": ("Text", extract_from_txt, False),
+    ".md": ("Text", extract_from_txt, False),
+    ".rtf": ("Text", extract_from_txt, False),
+    ".json": ("Text", extract_from_txt, False),
+    ".xml": ("Text", extract_from_txt, False),
+    ".html": ("Text", extract_from_txt, False),
+    ".htm": ("Text", extract_from_txt, False),
+}
+
+
+def _extract_url_cached(url: str) -> str:
+    # Fetch URL text once per TTL; transient errors are not cached
+    text = _url_cache.get(url)
+    if text is not None:
+        return text
+    text = extract_from_url(url)
+    if not text.startswith(("Error:", "Invalid URL:")):
+        _url_cache.set(url, text)
+    return text
+
+
+def _file_key(suffix: str, file) -> tuple[str, str]:
+    # Cache key: the content's SHA-256, hashed in chunks from the start
+    file.seek(0)
+    digest = hashlib.file_digest(file, "sha256").hexdigest()
+    file.seek(0)
+    return suffix, digest
+
+
+def _spool(file) -> str:
+    # Stream an upload to a temp path a worker process can open. Caller
+    # removes the file.
+    file.seek(0)
+    fd, tmp_path = tempfile.mkstemp(prefix="rcjy_doc_")
+    with os.fdopen(fd, "wb") as out:
+        shutil.copyfileobj(file, out, 1024 * 1024)
+    return tmp_path
+
+
+def _extract_file(suffix: str, source) -> str:
+    # Module-level so worker processes can unpickle it; they get a path,
+    # threads get the open file
+    if isinstance(source, str):
+        with open(source, "rb") as file:
+            return _DOC_EXTRACTORS[suffix][1](file)
+    return _DOC_EXTRACTORS[suffix][1](source)
+
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def _get_process_pool():
+    # Long-lived, since spawning workers costs an interpreter start each.
+    # spawn rather than fork: the parent has threads and open sockets.
+    # multiprocessing.Pool rather than ProcessPoolExecutor because its public
+    # terminate() can kill a worker stuck in a parser.
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = multiprocessing.get_context("spawn").Pool(processes=_EXTRACT_PROCESSES)
+        return _process_pool
+
+
+def _reset_process_pool():
+    # Kill a pool with a stuck or dead worker; the next call starts a fresh one
+    global _process_pool
+    with _process_pool_lock:
+        pool, _process_pool = _process_pool, None
+    if pool is not None:
+        pool.terminate()
+
+
+def _extract_documents(docs: list[tuple[str, str, object]]) -> list[str]:
+    # Extract text from (name, suffix, binary file) documents, several at a
+    # time. The files are streamed, never read whole. Results come back in
+    # input order; a file that times out or fails gets an error string and
+    # is not cached.
+    keys = [_file_key(suffix, file) for _, suffix, file in docs]
+    results = [_file_cache.get(key) for key in keys]
+    todo = [i for i, text in enumerate(results) if text is None]
+    # A lone cheap document is parsed inline; PDFs always go to the process
+    # pool so even a single upload gets the timeout and isolation
+    if len(todo) <= 1 and not any(docs[i][1] in _PROCESS_SUFFIXES for i in todo):
+        for i in todo:
+            _, suffix, file = docs[i]
+            results[i] = _file_cache.get_or_set(keys[i], lambda: _extract_file(suffix, file))
+        return results
+
+    threads = ThreadPoolExecutor(max_workers=min(len(todo), _EXTRACT_WORKERS), thread_name_prefix="rcjy-extract")
+    waits = {}  # index -> (wait(timeout) for the text, in a worker process, submitted at)
+    spooled = []  # temp copies handed to worker processes
+    stuck_process = False
+    try:
+        for i in todo:
+            _, suffix, file = docs[i]
+            if suffix in _PROCESS_SUFFIXES:
+                try:
+                    spooled.append(_spool(file))
+                    result = _get_process_pool().apply_async(_extract_file, (suffix, spooled[-1]))
+                    waits[i] = (result.get, True, time.monotonic())
+                    continue
+                except OSError:
+                    logger.warning("Process pool unavailable, extracting %s in a thread", suffix)
+                except ValueError:  # pool terminated by a concurrent reset
+                    pass
+            future = threads.submit(_extract_file, suffix, file)
+            waits[i] = (future.result, False, time.monotonic())
+
+        for i in todo:
+            name = docs[i][0]
+            wait, in_process, submitted = waits[i]
+            try:
+                results[i] = wait(timeout=max(0.0, submitted + _EXTRACT_TIMEOUT - time.monotonic()))
+                _file_cache.set(keys[i], results[i])
+            except (FutureTimeout, multiprocessing.TimeoutError):
+                logger.warning("Extraction of '%s' timed out after %ds", name, _EXTRACT_TIMEOUT)
+                results[i] = f"Error: Extraction timed out after {_EXTRACT_TIMEOUT}s."
+                stuck_process = stuck_process or in_process
+            except Exception:
+                logger.exception("Extraction of '%s' failed", name)
+                results[i] = "Error: Could not read file."
+    finally:
+        # Don't wait for timed-out threads; they finish in the background
+        threads.shutdown(wait=False, cancel_futures=True)
+        if stuck_process:
+            _reset_process_pool()
+        for tmp_path in spooled:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+    return results
+
+
+def get_cache_stats() -> dict:
+    return {
+        "url": _url_cache.stats(),
+        "files": _file_cache.stats(),
+        "dns": _dns_cache.stats(),
+        "url_disk": _url_disk_cache.stats(),
+    }
+
+
+class ExtractedContent(NamedTuple):
+    # Extracted reference material: titled text parts plus raw attachments
+    parts: list[tuple[str, str]]
+    attachments: list[tuple[str, str, bytes]]
+
+    @property
+    def text(self) -> str:
+        combined = "\n\n---\n\n".join(f"[{title}]\n{content}" for title, content in self.parts)
+        return combined or "No content provided."
+
+    @property
+    def has_content(self) -> bool:
+        return bool(self.parts)
+
+    def with_prompt(self, prompt: str) -> "ExtractedContent":
+        # Prepend the user's prompt as the first part
+        prompt = (prompt or "").strip()
+        if not prompt:
+            return self
+        return ExtractedContent([("User input", prompt)] + list(self.parts), self.attachments)
+
+
+def extract_content(
     text: Optional[str] = None,
     url: Optional[str] = None,
     files: Optional[list] = None,
-) -> tuple[str, list[tuple[str, str, bytes]]]:
+) -> ExtractedContent:
     parts: list[tuple[str, str]] = []
     attachments: list[tuple[str, str, bytes]] = []
 
@@ -330,9 +667,10 @@ def get_content_from_input(
         parts.append(("User input", text.strip()))
 
     if url and url.strip():
-        parts.append(("URL content", extract_from_url(url.strip())))
+        parts.append(("URL content", _extract_url_cached(url.strip())))
 
     if files:
+        documents = []  # (part index, name, suffix, file), extracted together below
         for f in files:
             if f is None:
                 continue
@@ -359,88 +697,63 @@ def get_content_from_input(
             except Exception:
                 pass  # If we can't check size, proceed cautiously
 
+            if isinstance(f, io.TextIOBase):
+                f = io.BytesIO(f.read().encode("utf-8"))
+
+            if suffix in _DOC_EXTRACTORS:
+                # The extractors stream from the file; only a document that
+                # is also kept as an attachment is read whole
+                label, _, attach = _DOC_EXTRACTORS[suffix]
+                if attach:
+                    try:
+                        attachments.append((name, mime, f.read()))
+                    except Exception:
+                        continue
+                documents.append((len(parts), name, suffix, f))
+                parts.append((f"{label}: {name}", ""))
+                continue
+
+            try:
+                raw = f.read()
+            except Exception:
+                continue
+            if isinstance(raw, str):
+                raw = raw.encode("utf-8")
+
             if is_image(name):
-                try:
-                    data = f.read()
-                    attachments.append((name, mime, data))
-                    parts.append((f"Image: {name}", "[Image attached]"))
-                except Exception:
-                    pass
+                attachments.append((name, mime, raw))
+                parts.append((f"Image: {name}", "[Image attached]"))
 
             elif is_audio(name):
-                try:
-                    data = f.read()
-                    attachments.append((name, mime, data))
-                    parts.append((f"Audio: {name}", f"[Audio file attached: {name}]"))
-                except Exception:
-                    pass
+                attachments.append((name, mime, raw))
+                parts.append((f"Audio: {name}", f"[Audio file attached: {name}]"))
 
             elif is_video(name):
-                try:
-                    data = f.read()
-                    attachments.append((name, mime, data))
-                    parts.append((f"Video: {name}", f"[Video file attached: {name}]"))
-                except Exception:
-                    pass
-
-            elif suffix == ".pdf":
-                content = extract_from_pdf(f)
-                parts.append((f"PDF: {name}", content))
-                try:
-                    f.seek(0)
-                    attachments.append((name, mime, f.read()))
-                except Exception:
-                    pass
-
-            elif suffix in (".docx", ".doc"):
-                content = extract_from_docx(f)
-                parts.append((f"Document: {name}", content))
-                try:
-                    f.seek(0)
-                    attachments.append((name, mime, f.read()))
-                except Exception:
-                    pass
-
-            elif suffix in (".pptx", ".ppt"):
-                content = extract_from_pptx(f)
-                parts.append((f"Presentation: {name}", content))
-                try:
-                    f.seek(0)
-                    attachments.append((name, mime, f.read()))
-                except Exception:
-                    pass
+                attachments.append((name, mime, raw))
+                parts.append((f"Video: {name}", f"[Video file attached: {name}]"))
 
-            elif suffix in (".xlsx", ".xls"):
-                content = extract_from_xlsx(f)
-                parts.append((f"Spreadsheet: {name}", content))
+            elif len(raw) < 200_000:
                 try:
-                    f.seek(0)
-                    attachments.append((name, mime, f.read()))
-                except Exception:
-                    pass
+                    txt = raw.decode("utf-8", errors="strict")
+                    parts.append((f"File: {name}", txt[:30000]))
+                except UnicodeDecodeError:
+                    attachments.append((name, mime, raw))
+                    parts.append((f"Binary: {name}", f"[Binary file attached: {name}]"))
+            else:
+                attachments.append((name, mime, raw))
+                parts.append((f"File: {name}", f"[Large file attached: {name}]"))
 
-            elif suffix == ".csv":
-                parts.append((f"CSV: {name}", extract_from_csv(f)))
+        texts = _extract_documents([(name, suffix, file) for _, name, suffix, file in documents])
+        for (index, *_), text in zip(documents, texts):
+            parts[index] = (parts[index][0], text)
 
-            elif suffix in (".txt", ".md", ".rtf", ".json", ".xml", ".html", ".htm"):
-                parts.append((f"Text: {name}", extract_from_txt(f)))
+    return ExtractedContent(parts, attachments)
 
-            else:
-                try:
-                    raw = f.read()
-                    if isinstance(raw, bytes):
-                        if len(raw) < 200_000:
-                            try:
-                                txt = raw.decode("utf-8", errors="strict")
-                                parts.append((f"File: {name}", txt[:30000]))
-                            except UnicodeDecodeError:
-                                attachments.append((name, mime, raw))
-                                parts.append((f"Binary: {name}", f"[Binary file attached: {name}]"))
-                        else:
-                            attachments.append((name, mime, raw))
-                            parts.append((f"File: {name}", f"[Large file attached: {name}]"))
-                except Exception:
-                    pass
 
-    combined = "\n\n---\n\n".join(f"[{title}]\n{content}" for title, content in parts)
-    return combined or "No content provided.", attachments
+def get_content_from_input(
+    text: Optional[str] = None,
+    url: Optional[str] = None,
+    files: Optional[list] = None,
+) -> tuple[str, list[tuple[str, str, bytes]]]:
+    content = extract_content(text=text, url=url, files=files)
+    return content.text, content.attachments
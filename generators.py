@@ -1,21 +1,32 @@
 import base64
-import io
+import itertools
 import logging
 import os
+import struct
 import tempfile
+import threading
 import time
-import wave
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 
 from google.genai import types as genai_types
 
-from rcjy_config import MODELS, get_genai_client
-from content_extractor import get_content_from_input
+from rcjy_config import MODELS, TTS_MAX_CONCURRENCY, get_genai_client
+from content_extractor import ExtractedContent, get_content_from_input
+from operation_tracker import get_tracker
+from rate_limiter import get_limiter
+from retry_policy import DEFAULT_POLICY, RATE_LIMITED
+from result_cache import content_hash, get_result_cache, make_key
 
 logger = logging.getLogger("rcjy.generators")
 
 MAX_PROMPT_LENGTH = 10_000
 MAX_CONTEXT_LENGTH = 50_000
 MAX_TTS_TEXT_LENGTH = 5_000
+MAX_IMAGE_VARIANTS = 4
+PODCAST_MAX_WORDS = 600
+PODCAST_RETRY_BUDGET = 600  # seconds of retrying allowed across one podcast
+VIDEO_CLIP_BUDGET = 900  # seconds allowed per clip (submit, render, retries) in one video chain
 
 
 def _scrub_api_key(text: str) -> str:
@@ -69,58 +80,94 @@ _ALLOWED_DURATIONS = {"5", "6", "7", "8"}
 _ALLOWED_PODCAST_LENGTHS = {"short", "standard"}
 
 
+class WavAssembler:
+    # Collects raw PCM parts and emits one WAV with a single RIFF header.
+    # Parts are kept as memoryviews, so frames are never re-copied until
+    # the caller asks for bytes; write_to/iter_bytes stream without that.
+
+    def __init__(self, sample_rate: int = 24000, channels: int = 1, sample_width: int = 2):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self._parts: list[memoryview] = []
+        self.data_size = 0
+
+    def add(self, pcm_data: bytes):
+        if not pcm_data:
+            return
+        view = memoryview(pcm_data)
+        self._parts.append(view)
+        self.data_size += view.nbytes
+
+    def __len__(self) -> int:
+        return len(self._parts)
+
+    def header(self) -> bytes:
+        block_align = self.channels * self.sample_width
+        return struct.pack(
+            "<4sI4s4sIHHIIHH4sI",
+            b"RIFF", 36 + self.data_size, b"WAVE",
+            b"fmt ", 16, 1, self.channels, self.sample_rate,
+            self.sample_rate * block_align, block_align, self.sample_width * 8,
+            b"data", self.data_size,
+        )
+
+    def iter_bytes(self):
+        yield self.header()
+        yield from self._parts
+
+    def write_to(self, fp) -> int:
+        # Stream the WAV to any writable file/socket-like object
+        written = 0
+        for chunk in self.iter_bytes():
+            fp.write(chunk)
+            written += len(chunk)
+        return written
+
+    def getvalue(self) -> bytes:
+        return b"".join(self.iter_bytes())
+
+
 def _pcm_to_wav(pcm_data: bytes, sample_rate: int = 24000, channels: int = 1) -> bytes:
-    buf = io.BytesIO()
-    with wave.open(buf, "wb") as wav:
-        wav.setnchannels(channels)
-        wav.setsampwidth(2)
-        wav.setframerate(sample_rate)
-        wav.writeframes(pcm_data)
-    return buf.getvalue()
-
-
-def _concat_wavs(wav_list: list[bytes]) -> bytes:
-    if len(wav_list) == 1:
-        return wav_list[0]
-    all_frames = b""
-    params = None
-    for wav_bytes in wav_list:
-        with wave.open(io.BytesIO(wav_bytes), "rb") as w:
-            if params is None:
-                params = w.getparams()
-            all_frames += w.readframes(w.getnframes())
-    buf = io.BytesIO()
-    with wave.open(buf, "wb") as out:
-        out.setparams(params)
-        out.writeframes(all_frames)
-    return buf.getvalue()
-
-
-def _retry(fn, retries=2):
-    # Retry on rate-limit and timeout errors
-    last_err = None
-    for attempt in range(retries + 1):
-        try:
-            return fn()
-        except Exception as e:
-            last_err = e
-            msg = str(e).lower()
-            # Don't retry safety/content filter errors
-            if "filtered" in msg or "responsible ai" in msg or "safety" in msg or "blocked" in msg:
-                raise
-            if "429" in str(e) or "rate limit" in msg or "quota" in msg or "resource_exhausted" in msg:
-                wait = min(30 * (attempt + 1), 120)
-                logger.warning("Rate limited, waiting %ds (attempt %d/%d)", wait, attempt + 1, retries + 1)
-                if attempt < retries:
-                    time.sleep(wait)
-                    continue
-            if "timeout" in msg or "timed out" in msg or "deadline" in msg:
-                logger.warning("Timeout (attempt %d/%d)", attempt + 1, retries + 1)
-                if attempt < retries:
-                    time.sleep(5 * (attempt + 1))
-                    continue
-            raise
-    raise last_err
+    wav = WavAssembler(sample_rate=sample_rate, channels=channels)
+    wav.add(pcm_data)
+    return wav.getvalue()
+
+
+def _retry(fn, retries=2, model_id: str = None, deadline: float = None, on_retry=None, retry_on=None):
+    # Retry rate-limit and transient errors via the shared RetryPolicy. Every
+    # attempt first takes a token from the model's rate-limit bucket.
+    # deadline: absolute time.monotonic() bounding all retries of a generation.
+    # retry_on: subset of retryable kinds, for calls that must not be repeated blindly.
+    # Rate-limit queueing counts against the deadline too.
+    def _attempt():
+        if model_id:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            get_limiter().acquire(model_id, timeout=timeout)
+        return fn()
+
+    return DEFAULT_POLICY.call(
+        _attempt, model_id=model_id or "", max_attempts=retries + 1,
+        deadline=deadline, on_retry=on_retry, retry_on=retry_on,
+    )
+
+
+def _cached_call(use_cache: bool, fn: str, model_id: str, prompt: str, context: str, settings: dict, compute):
+    # Opt-in result cache; callers pass use_cache=False for "new variation"
+    if not use_cache:
+        return compute()
+    key = make_key(fn, model_id, prompt, context, settings)
+    return get_result_cache().get_or_compute(key, compute)
+
+
+def _combine_context(prompt: str, context_text: str, url: str, files: list, context: ExtractedContent = None) -> str:
+    # Prefer the UI's already-extracted content; only extract here for legacy callers
+    if context is not None:
+        return context.with_prompt(prompt).text
+    combined_text, _ = get_content_from_input(text=prompt, url=url, files=files)
+    if context_text and context_text != "No content provided.":
+        combined_text = f"{context_text}\n\n---\n\n{combined_text}"
+    return combined_text
 
 
 def _lang_instruction(lang: str) -> str:
@@ -136,25 +183,28 @@ def _lang_instruction(lang: str) -> str:
 
 
 
-def generate_text(
-    prompt: str,
-    context_text: str = "",
-    url: str = "",
-    files: list = None,
-    text_type: str = "article",
-    tone: str = "professional",
-    model: str = "pro",
-    lang: str = "en",
-) -> str:
+def _stream_text(client, model_id: str, contents, config=None, deadline: float = None):
+    # Yield non-empty text pieces from generate_content_stream. Opening the
+    # stream (up to the first chunk) is retried; later failures propagate.
+    def _open():
+        stream = client.models.generate_content_stream(model=model_id, contents=contents, config=config)
+        return stream, next(stream, None)
+
+    stream, first = _retry(_open, model_id=model_id, deadline=deadline)
+    for chunk in itertools.chain([first] if first is not None else [], stream):
+        if chunk.text:
+            yield chunk.text
+
+
+def _prepare_text_request(prompt, context_text, url, files, text_type, tone, model, lang, context):
+    # Validated (model, model_id, text_type, tone, lang, user_content, full contents)
     prompt = _validate_prompt(prompt)
     text_type = text_type if text_type in _ALLOWED_TEXT_TYPES else "article"
     tone = tone if tone in _ALLOWED_TONES else "professional"
     lang = lang if lang in _ALLOWED_LANGS else "en"
     if model not in MODELS.get("text", {}):
         model = "pro"
-    combined_text, _ = get_content_from_input(text=prompt, url=url, files=files)
-    if context_text and context_text != "No content provided.":
-        combined_text = f"{context_text}\n\n---\n\n{combined_text}"
+    combined_text = _combine_context(prompt, context_text, url, files, context)
 
     model_id = (
         MODELS["text"].get(model, MODELS["text"]["pro"])
@@ -184,25 +234,170 @@ Requirements:
 - Appropriate for a government media department"""
 
     user_content = combined_text[:30000] if combined_text else prompt
+    return model, model_id, text_type, tone, lang, user_content, f"{system_prompt}\n\n{user_content}"
+
+
+_TEXT_CONFIG = genai_types.GenerateContentConfig(
+    temperature=0.8,
+    max_output_tokens=8192,
+)
+
+
+
+def generate_text(
+    prompt: str,
+    context_text: str = "",
+    url: str = "",
+    files: list = None,
+    text_type: str = "article",
+    tone: str = "professional",
+    model: str = "pro",
+    lang: str = "en",
+    context: ExtractedContent = None,
+    use_cache: bool = False,
+) -> str:
+    model, model_id, text_type, tone, lang, user_content, contents = _prepare_text_request(
+        prompt, context_text, url, files, text_type, tone, model, lang, context,
+    )
+
+    def _generate():
+        client = get_genai_client()
+        logger.info("Generating text: type=%s, tone=%s, model=%s, lang=%s", text_type, tone, model, lang)
+
+        response = _retry(lambda: client.models.generate_content(
+            model=model_id,
+            contents=contents,
+            config=_TEXT_CONFIG,
+        ), model_id=model_id)
+
+        result = response.text or ""
+        if not result.strip():
+            raise RuntimeError("Text generation returned empty result.")
+        logger.info("Text generated (%d chars)", len(result))
+        return result
+
+    return _cached_call(
+        use_cache, "text", model_id, user_content, "",
+        {"type": text_type, "tone": tone, "lang": lang}, _generate,
+    )
+
+
+
+def generate_text_stream(
+    prompt: str,
+    context_text: str = "",
+    url: str = "",
+    files: list = None,
+    text_type: str = "article",
+    tone: str = "professional",
+    model: str = "pro",
+    lang: str = "en",
+    context: ExtractedContent = None,
+    use_cache: bool = False,
+):
+    # Same as generate_text, but yields text chunks as the model writes them.
+    # Only opening the stream is retried; once text has been shown, a failure
+    # mid-stream is raised rather than restarting from scratch.
+    model, model_id, text_type, tone, lang, user_content, contents = _prepare_text_request(
+        prompt, context_text, url, files, text_type, tone, model, lang, context,
+    )
+    cache_key = make_key("text", model_id, user_content, "", {"type": text_type, "tone": tone, "lang": lang})
+    if use_cache:
+        cached = get_result_cache().get(cache_key)
+        if cached is not None:
+            yield cached
+            return
 
     client = get_genai_client()
-    logger.info("Generating text: type=%s, tone=%s, model=%s, lang=%s", text_type, tone, model, lang)
+    logger.info("Streaming text: type=%s, tone=%s, model=%s, lang=%s", text_type, tone, model, lang)
+    started = time.monotonic()
+
+    parts = []
+    for text in _stream_text(client, model_id, contents, _TEXT_CONFIG):
+        if not parts:
+            logger.info("Text first token after %.1fs", time.monotonic() - started)
+        parts.append(text)
+        yield text
+
+    result = "".join(parts)
+    if not result.strip():
+        raise RuntimeError("Text generation returned empty result.")
+    logger.info("Text streamed (%d chars in %.1fs)", len(result), time.monotonic() - started)
+    if use_cache:
+        get_result_cache().set(cache_key, result)
+
 
+
+def _imagen_images(client, model_id: str, full_prompt: str, aspect_ratio: str, n: int) -> list[tuple[bytes, str]]:
+    # n images from one Imagen request
+    response = _retry(lambda: client.models.generate_images(
+        model=model_id,
+        prompt=full_prompt,
+        config=genai_types.GenerateImagesConfig(
+            number_of_images=n,
+            aspect_ratio=aspect_ratio,
+        ),
+    ), model_id=model_id)
+    if not response.generated_images:
+        raise RuntimeError("No image returned. Try a different prompt or model.")
+    return [(img.image.image_bytes, "image/png") for img in response.generated_images]
+
+
+def _gemini_image(client, model_id: str, full_prompt: str, file_attachments: list) -> tuple[bytes, str]:
+    # Gemini native image generation, optionally guided by attached images
+    contents = full_prompt
+    image_parts = [
+        genai_types.Part(inline_data=genai_types.Blob(mime_type=mime, data=raw))
+        for name, mime, raw in file_attachments
+    ]
+    if image_parts:
+        contents = [genai_types.Part(text=full_prompt)] + image_parts
     response = _retry(lambda: client.models.generate_content(
         model=model_id,
-        contents=f"{system_prompt}\n\n{user_content}",
+        contents=contents,
         config=genai_types.GenerateContentConfig(
-            temperature=0.8,
-            max_output_tokens=8192,
+            response_modalities=["IMAGE"],
         ),
-    ))
+    ), model_id=model_id)
+    if response.candidates and response.candidates[0].content and response.candidates[0].content.parts:
+        for part in response.candidates[0].content.parts:
+            if part.inline_data and part.inline_data.data:
+                return part.inline_data.data, part.inline_data.mime_type or "image/png"
+    # Check finish reason for specific errors
+    if response.candidates:
+        c = response.candidates[0]
+        fr = getattr(c, 'finish_reason', None)
+        logger.warning("Gemini image: finish_reason=%s", fr)
+        if fr and "NO_IMAGE" in str(fr):
+            raise RuntimeError(
+                "Image was blocked by safety filters. "
+                "Avoid brand names, logos, government symbols, or trademarked terms. "
+                "Try rephrasing your prompt."
+            )
+    raise RuntimeError("No image in API response. Try a different prompt.")
 
-    result = response.text or ""
-    if not result.strip():
-        raise RuntimeError("Text generation returned empty result.")
-    logger.info("Text generated (%d chars)", len(result))
-    return result
 
+def _prepare_image_request(prompt, context_text, files, model, aspect_ratio, lang, context):
+    # Validated (prompt, model, model_id, aspect_ratio, lang, full_prompt, image attachments)
+    prompt = _validate_prompt(prompt)
+    lang = lang if lang in _ALLOWED_LANGS else "en"
+    aspect_ratio = aspect_ratio if aspect_ratio in _ALLOWED_ASPECT_RATIOS else "16:9"
+    if model not in MODELS.get("image", {}):
+        model = "imagen_fast"
+    context_text = context_text[:MAX_CONTEXT_LENGTH] if context_text else ""
+    model_id = MODELS["image"].get(model, MODELS["image"]["imagen_fast"])
+    full_prompt = f"{context_text}\n\n{prompt}".strip() if context_text else prompt
+
+    if "imagen" in model_id:
+        file_attachments = []
+    elif context is not None:
+        file_attachments = context.attachments
+    elif files:
+        _, file_attachments = get_content_from_input(files=files)
+    else:
+        file_attachments = []
+    file_attachments = [a for a in file_attachments if "image" in a[1]]
+    return prompt, model, model_id, aspect_ratio, lang, full_prompt, file_attachments
 
 
 def generate_image(
@@ -212,71 +407,69 @@ def generate_image(
     model: str = "imagen_fast",
     aspect_ratio: str = "16:9",
     lang: str = "en",
+    context: ExtractedContent = None,
+    use_cache: bool = False,
 ) -> tuple[bytes, str]:
-    prompt = _validate_prompt(prompt)
-    lang = lang if lang in _ALLOWED_LANGS else "en"
-    aspect_ratio = aspect_ratio if aspect_ratio in _ALLOWED_ASPECT_RATIOS else "16:9"
-    if model not in MODELS.get("image", {}):
-        model = "imagen_fast"
-    context_text = context_text[:MAX_CONTEXT_LENGTH] if context_text else ""
-    model_id = MODELS["image"].get(model, MODELS["image"]["imagen_fast"])
-    full_prompt = f"{context_text}\n\n{prompt}".strip() if context_text else prompt
+    prompt, model, model_id, aspect_ratio, lang, full_prompt, file_attachments = _prepare_image_request(
+        prompt, context_text, files, model, aspect_ratio, lang, context,
+    )
 
-    client = get_genai_client()
-    logger.info("Generating image: model=%s, aspect=%s, lang=%s", model, aspect_ratio, lang)
-    is_imagen = "imagen" in model_id
+    def _generate():
+        client = get_genai_client()
+        logger.info("Generating image: model=%s, aspect=%s, lang=%s", model, aspect_ratio, lang)
+        if "imagen" in model_id:
+            return _imagen_images(client, model_id, full_prompt, aspect_ratio, 1)[0]
+        return _gemini_image(client, model_id, full_prompt, file_attachments)
+
+    return _cached_call(
+        use_cache, "image", model_id, full_prompt,
+        content_hash(*(raw for _, _, raw in file_attachments)),
+        {"aspect_ratio": aspect_ratio, "lang": lang}, _generate,
+    )
 
-    if is_imagen:
-        response = _retry(lambda: client.models.generate_images(
-            model=model_id,
-            prompt=full_prompt,
-            config=genai_types.GenerateImagesConfig(
-                number_of_images=1,
-                aspect_ratio=aspect_ratio,
-            ),
-        ))
-        if not response.generated_images:
-            raise RuntimeError("No image returned. Try a different prompt or model.")
-        img = response.generated_images[0]
-        return img.image.image_bytes, "image/png"
 
-    else:
-        # Gemini native image generation
-        contents = full_prompt
-        if files:
-            _, file_attachments = get_content_from_input(files=files)
-            image_parts = []
-            for name, mime, raw in file_attachments:
-                if "image" in mime:
-                    image_parts.append(genai_types.Part(
-                        inline_data=genai_types.Blob(mime_type=mime, data=raw)
-                    ))
-            if image_parts:
-                contents = [genai_types.Part(text=full_prompt)] + image_parts
-        response = _retry(lambda: client.models.generate_content(
-            model=model_id,
-            contents=contents,
-            config=genai_types.GenerateContentConfig(
-                response_modalities=["IMAGE"],
-            ),
-        ))
-        if response.candidates and response.candidates[0].content and response.candidates[0].content.parts:
-            for part in response.candidates[0].content.parts:
-                if part.inline_data and part.inline_data.data:
-                    return part.inline_data.data, part.inline_data.mime_type or "image/png"
-        # Check finish reason for specific errors
-        if response.candidates:
-            c = response.candidates[0]
-            fr = getattr(c, 'finish_reason', None)
-            logger.warning("Gemini image: finish_reason=%s", fr)
-            if fr and "NO_IMAGE" in str(fr):
-                raise RuntimeError(
-                    "Image was blocked by safety filters. "
-                    "Avoid brand names, logos, government symbols, or trademarked terms. "
-                    "Try rephrasing your prompt."
-                )
 
-    raise RuntimeError("No image in API response. Try a different prompt.")
+def generate_image_variants(
+    prompt: str,
+    context_text: str = "",
+    files: list = None,
+    model: str = "imagen_fast",
+    aspect_ratio: str = "16:9",
+    lang: str = "en",
+    context: ExtractedContent = None,
+    n: int = 4,
+):
+    # Yield n (bytes, mime) variants as they arrive. Imagen returns all of
+    # them from one request; Gemini has no batch option, so requests fan
+    # out concurrently and each image is yielded as soon as it completes.
+    n = max(1, min(int(n), MAX_IMAGE_VARIANTS))
+    prompt, model, model_id, aspect_ratio, lang, full_prompt, file_attachments = _prepare_image_request(
+        prompt, context_text, files, model, aspect_ratio, lang, context,
+    )
+    client = get_genai_client()
+    logger.info("Generating %d image variants: model=%s, aspect=%s, lang=%s", n, model, aspect_ratio, lang)
+
+    if "imagen" in model_id:
+        yield from _imagen_images(client, model_id, full_prompt, aspect_ratio, n)
+        return
+
+    produced, first_error = 0, None
+    with ThreadPoolExecutor(max_workers=n, thread_name_prefix="rcjy-img") as pool:
+        futures = [
+            pool.submit(_gemini_image, client, model_id, full_prompt, file_attachments)
+            for _ in range(n)
+        ]
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.warning("Image variant failed: %s", type(e).__name__)
+                first_error = first_error or e
+                continue
+            produced += 1
+            yield result
+    if not produced and first_error is not None:
+        raise first_error
 
 
 
@@ -299,18 +492,15 @@ def _build_video_prompt(prompt: str, context_text: str, lang: str) -> str:
     return full_prompt
 
 
-def _poll_video_operation(client, operation, timeout: int = 900):
-    # Poll video generation operation until done or timeout
-    elapsed = 0
-    while not operation.done:
-        time.sleep(15)
-        elapsed += 15
-        operation = client.operations.get(operation)
-        if elapsed % 60 == 0:
-            logger.info("Video in progress... (%ds)", elapsed)
-        if elapsed >= timeout:
-            raise TimeoutError(f"Video generation timed out after {timeout // 60} minutes.")
-    return operation
+# A video submit that times out or 5xxs may still have started a (billed)
+# job, so only rejections before acceptance (429) are resubmitted
+_VIDEO_SUBMIT_RETRY_ON = frozenset({RATE_LIMITED})
+
+
+def _poll_video_operation(client, operation, timeout: float = 900) -> Future:
+    # Track a video operation on the shared tracker loop. Returns a Future for
+    # the finished operation; no thread waits while Veo renders.
+    return get_tracker().track(client, operation, timeout)
 
 
 def _save_video_to_bytes(client, video) -> bytes:
@@ -327,7 +517,126 @@ def _save_video_to_bytes(client, video) -> bytes:
             os.remove(tmp_path)
 
 
-def generate_video(
+_video_executor = None
+_video_executor_lock = threading.Lock()
+
+
+def _get_video_executor() -> ThreadPoolExecutor:
+    # Runs video chain steps for callers that don't bring their own pool
+    global _video_executor
+    with _video_executor_lock:
+        if _video_executor is None:
+            _video_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="rcjy-video")
+        return _video_executor
+
+
+class _VideoChain:
+    # The initial clip and its extensions as a chain of short steps. Submits
+    # and the final download run on the executor; between them the operation
+    # is only tracked on the poller loop, whose completion schedules the next
+    # step. result resolves to (bytes, mime) or the first error.
+
+    def __init__(self, client, model_id: str, full_prompt: str, config: dict, initial_dur: int,
+                 target_dur: int, max_extensions: int, deadline: float, progress_callback, executor):
+        self.client = client
+        self.model_id = model_id
+        self.full_prompt = full_prompt
+        self.config = config
+        self.current_dur = initial_dur
+        self.target_dur = target_dur
+        self.max_extensions = max_extensions
+        self.deadline = deadline
+        self.progress_callback = progress_callback
+        self.executor = executor
+        self.ext_count = 0
+        self.result = Future()
+
+    def start(self) -> Future:
+        self._step(self._submit, None)
+        return self.result
+
+    def _progress(self, msg: str):
+        if self.progress_callback:
+            self.progress_callback(msg)
+
+    def _remaining(self) -> float:
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("Video generation ran out of time.")
+        return remaining
+
+    def _step(self, fn, *args):
+        # Run one step on the executor; an error ends the chain
+        def _run():
+            try:
+                fn(*args)
+            except Exception as e:
+                self.result.set_exception(e)
+
+        try:
+            self.executor.submit(_run)
+        except RuntimeError as e:  # executor shut down
+            self.result.set_exception(e)
+
+    def _report_retry(self, exc, wait, attempt):
+        self._progress(f"Service busy, retrying in {int(wait)}s...")
+
+    def _submit(self, video_obj):
+        if video_obj is None:
+            self._progress("Generating initial clip...")
+            request = dict(model=self.model_id, prompt=self.full_prompt, config=self.config)
+        else:
+            self.ext_count += 1
+            msg = (f"Extending video ({self.current_dur}s -> {self.current_dur + 7}s) "
+                   f"[step {self.ext_count}]...")
+            logger.info(msg)
+            self._progress(msg)
+            request = dict(
+                model=self.model_id,
+                prompt=f"Continue the scene seamlessly. {self.full_prompt}",
+                video=video_obj.video,
+                config={"number_of_videos": 1, "resolution": "720p"},
+            )
+        # The limiter paces submits against the Veo quota
+        operation = _retry(
+            lambda: self.client.models.generate_videos(**request),
+            model_id=self.model_id, deadline=self.deadline,
+            on_retry=self._report_retry, retry_on=_VIDEO_SUBMIT_RETRY_ON,
+        )
+        extended = video_obj is not None
+        _poll_video_operation(self.client, operation, self._remaining()).add_done_callback(
+            lambda f: self._on_operation(f, extended),
+        )
+
+    def _on_operation(self, future: Future, extended: bool):
+        # Runs on the tracker loop: hand the finished clip back to the executor
+        exc = future.exception()
+        if exc is not None:
+            self.result.set_exception(exc)
+            return
+        self._step(self._after_clip, future.result(), extended)
+
+    def _after_clip(self, operation, extended: bool):
+        video_obj = operation.response.generated_videos[0]
+        if extended:
+            self.current_dur += 7
+        if self.current_dur < self.target_dur and self.ext_count < self.max_extensions:
+            self._submit(video_obj)
+            return
+        if self.ext_count:
+            self._progress("Downloading final video...")
+        result = _save_video_to_bytes(self.client, video_obj)
+        if self.ext_count:
+            logger.info(
+                "Extended video generated (%d bytes, ~%ds, %d extensions)",
+                len(result), self.current_dur, self.ext_count,
+            )
+        else:
+            logger.info("Video generated (%d bytes)", len(result))
+        self.result.set_result((result, "video/mp4"))
+
+
+def start_video(
     prompt: str,
     context_text: str = "",
     aspect_ratio: str = "16:9",
@@ -337,8 +646,11 @@ def generate_video(
     lang: str = "en",
     extend_seconds: int = 0,
     progress_callback=None,
-) -> tuple[bytes, str]:
-    # Generate video, optionally extended via Veo 3.1 extension loop
+    executor: ThreadPoolExecutor = None,
+) -> Future:
+    # Start a video (optionally extended via the Veo 3.1 extension loop) and
+    # return a Future for (bytes, mime) without waiting for it. Steps run on
+    # executor (a shared default pool if None).
     prompt = _validate_prompt(prompt)
     lang = lang if lang in _ALLOWED_LANGS else "en"
     aspect_ratio = aspect_ratio if aspect_ratio in {"16:9", "9:16"} else "16:9"
@@ -365,90 +677,28 @@ def generate_video(
         model_id, aspect_ratio, duration, resolution, extend_seconds, lang,
     )
 
-    client = get_genai_client()
-
-    # generate initial clip
-    if progress_callback:
-        progress_callback("Generating initial clip...")
-    operation = client.models.generate_videos(
-        model=model_id,
-        prompt=full_prompt,
-        config={
-            "aspect_ratio": aspect_ratio,
-            "duration_seconds": duration,
-            "resolution": resolution.lower(),
-        },
-    )
-    operation = _poll_video_operation(client, operation)
-    video_obj = operation.response.generated_videos[0]
-
-    if extend_seconds <= 0:
-        # single clip, return directly
-        result = _save_video_to_bytes(client, video_obj)
-        logger.info("Video generated (%d bytes)", len(result))
-        return result, "video/mp4"
-
-    # extension loop
+    # One deadline for the whole clip + extension chain: submits, rate-limit
+    # queueing, retries and polling all spend from it
     initial_dur = int(duration)
-    current_dur = initial_dur
     target_dur = min(initial_dur + extend_seconds, 148)
     max_extensions = 20
-    ext_count = 0
-
-    logger.info(
-        "Starting extension loop: current=%ds, target=%ds", current_dur, target_dur,
+    planned = min(max_extensions, -(-(target_dur - initial_dur) // 7))
+    deadline = time.monotonic() + VIDEO_CLIP_BUDGET * (1 + planned)
+    if planned:
+        logger.info("Extension loop planned: current=%ds, target=%ds", initial_dur, target_dur)
+
+    chain = _VideoChain(
+        get_genai_client(), model_id, full_prompt,
+        {"aspect_ratio": aspect_ratio, "duration_seconds": duration, "resolution": resolution.lower()},
+        initial_dur, target_dur, max_extensions, deadline, progress_callback,
+        executor or _get_video_executor(),
     )
+    return chain.start()
 
-    while current_dur < target_dur and ext_count < max_extensions:
-        ext_count += 1
-
-        if ext_count > 1:
-            logger.info("Waiting 10s before next extension to avoid rate limits...")
-            time.sleep(10)
-
-        msg = f"Extending video ({current_dur}s -> {current_dur + 7}s) [step {ext_count}]..."
-        logger.info(msg)
-        if progress_callback:
-            progress_callback(msg)
-
-        ext_prompt = f"Continue the scene seamlessly. {full_prompt}"
-
-        for attempt in range(3):
-            try:
-                operation = client.models.generate_videos(
-                    model=model_id,
-                    prompt=ext_prompt,
-                    video=video_obj.video,
-                    config={
-                        "number_of_videos": 1,
-                        "resolution": "720p",
-                    },
-                )
-                break
-            except Exception as e:
-                if ("429" in str(e) or "rate limit" in str(e).lower() or "quota" in str(e).lower()) and attempt < 2:
-                    wait = 30 * (attempt + 1)
-                    logger.warning("Rate limited on extension, waiting %ds (attempt %d/3)", wait, attempt + 1)
-                    if progress_callback:
-                        progress_callback(f"Rate limited, retrying in {wait}s...")
-                    time.sleep(wait)
-                else:
-                    raise
-
-        operation = _poll_video_operation(client, operation)
-        video_obj = operation.response.generated_videos[0]
-        current_dur += 7
-
-    # download final extended video
-    if progress_callback:
-        progress_callback("Downloading final video...")
-    result = _save_video_to_bytes(client, video_obj)
-    logger.info(
-        "Extended video generated (%d bytes, ~%ds, %d extensions)",
-        len(result), current_dur, ext_count,
-    )
-    return result, "video/mp4"
 
+def generate_video(*args, **kwargs) -> tuple[bytes, str]:
+    # Blocking wrapper around start_video for callers that want the bytes
+    return start_video(*args, **kwargs).result()
 
 
 def _tts_single(text: str, voice_name: str, model_id: str, client) -> bytes:
@@ -466,7 +716,7 @@ def _tts_single(text: str, voice_name: str, model_id: str, client) -> bytes:
                 )
             ),
         ),
-    ))
+    ), model_id=model_id)
     for part in response.candidates[0].content.parts:
         if part.inline_data and part.inline_data.data:
             return _pcm_to_wav(part.inline_data.data)
@@ -487,6 +737,7 @@ def generate_voice(
     style_hint: str = "",
     tts_model: str = "flash",
     lang: str = "en",
+    use_cache: bool = False,
 ) -> tuple[bytes, str]:
     text = _validate_prompt(text, max_len=MAX_TTS_TEXT_LENGTH)
     lang = lang if lang in _ALLOWED_LANGS else "en"
@@ -509,82 +760,175 @@ def generate_voice(
     if context_text:
         full_text = f"[Context: {context_text[:500]}]\n\n{full_text}"
 
-    client = get_genai_client()
-    logger.info("Generating voice: voice=%s, model=%s, lang=%s", voice_name, tts_model, lang)
-    wav = _tts_single(full_text, voice_name, model_id, client)
-    logger.info("Voice generated (%d bytes)", len(wav))
-    return wav, "audio/wav"
+    def _generate():
+        client = get_genai_client()
+        logger.info("Generating voice: voice=%s, model=%s, lang=%s", voice_name, tts_model, lang)
+        wav = _tts_single(full_text, voice_name, model_id, client)
+        logger.info("Voice generated (%d bytes)", len(wav))
+        return wav, "audio/wav"
 
+    return _cached_call(
+        use_cache, "voice", model_id, full_text, "", {"voice": voice_name}, _generate,
+    )
 
 
-def _multi_speaker_tts(script: str, voice_host: str, voice_guest: str, client, lang: str = "en") -> bytes:
-    model_id = (
-        MODELS["voice"].get("flash", MODELS["voice"])
-        if isinstance(MODELS["voice"], dict) else MODELS["voice"]
-    )
 
-    lines = script.strip().split("\n")
-    chunks, current_chunk, current_words = [], [], 0
-    for line in lines:
-        wc = len(line.split())
-        if current_words + wc > 150 and current_chunk:
-            chunks.append("\n".join(current_chunk))
-            current_chunk, current_words = [line], wc
-        else:
-            current_chunk.append(line)
-            current_words += wc
-    if current_chunk:
-        chunks.append("\n".join(current_chunk))
-    if len(chunks) <= 1:
-        chunks = [script.strip()]
-
-    logger.info("Podcast TTS: %d chunks from %d-word script", len(chunks), len(script.split()))
-
-    wav_parts = []
-    for i, chunk in enumerate(chunks):
-        logger.info("  TTS chunk %d/%d (%d words)", i + 1, len(chunks), len(chunk.split()))
-        if lang == "ar":
-            tts_instruction = f"اقرأ حوار البودكاست التالي باللهجة السعودية الخليجية بشكل طبيعي وتعبيري:\n\n{chunk}"
-        elif lang == "both":
-            tts_instruction = f"Read this bilingual Arabic-English podcast dialogue naturally:\n\n{chunk}"
-        else:
-            tts_instruction = f"Read this podcast dialogue naturally:\n\n{chunk}"
+def _speaker_line(line: str) -> str:
+    # Arabic scripts sometimes label turns in Arabic; TTS expects Host/Guest
+    return line.replace("المقدم:", "Host:").replace("الضيف:", "Guest:")
+
+
+def _iter_script_chunks(pieces, max_words: int = 150, first_words: int = 60, max_total: int = PODCAST_MAX_WORDS):
+    # Cut a streamed script into TTS chunks at line (speaker-turn) boundaries
+    # as soon as enough words have accumulated. The first chunk is smaller so
+    # audio can start early. Stops after max_total words.
+    buffer, lines, words, total = "", [], 0, 0
+    limit = first_words
+
+    def _take(line):
+        nonlocal words, total
+        line = _speaker_line(line.strip())
+        count = len(line.split())
+        if not count:
+            return False
+        if total + count > max_total:
+            line = " ".join(line.split()[:max_total - total])
+            count = max_total - total
+            logger.warning("Script exceeded limit, truncating to %d words", max_total)
+        lines.append(line)
+        words += count
+        total += count
+        return total >= max_total
+
+    for piece in pieces:
+        *done, buffer = (buffer + piece).split("\n")
+        for line in done:
+            stop = _take(line)
+            if words >= limit or stop:
+                yield "\n".join(lines)
+                lines, words, limit = [], 0, max_words
+            if stop:
+                return
+    _take(buffer)
+    if lines:
+        yield "\n".join(lines)
+
+
+def _tts_dialogue_chunk(chunk: str, voice_host: str, voice_guest: str, model_id: str, client, lang: str,
+                        deadline: float = None):
+    # Synthesize one Host/Guest chunk, returns raw PCM or None
+    if lang == "ar":
+        tts_instruction = f"اقرأ حوار البودكاست التالي باللهجة السعودية الخليجية بشكل طبيعي وتعبيري:\n\n{chunk}"
+    elif lang == "both":
+        tts_instruction = f"Read this bilingual Arabic-English podcast dialogue naturally:\n\n{chunk}"
+    else:
+        tts_instruction = f"Read this podcast dialogue naturally:\n\n{chunk}"
 
-        # capture loop var
-        _inst = tts_instruction
-        response = _retry(lambda _t=_inst: client.models.generate_content(
-            model=model_id,
-            contents=_t,
-            config=genai_types.GenerateContentConfig(
-                response_modalities=["AUDIO"],
-                speech_config=genai_types.SpeechConfig(
-                    multi_speaker_voice_config=genai_types.MultiSpeakerVoiceConfig(
-                        speaker_voice_configs=[
-                            genai_types.SpeakerVoiceConfig(
-                                speaker="Host",
-                                voice_config=genai_types.VoiceConfig(
-                                    prebuilt_voice_config=genai_types.PrebuiltVoiceConfig(voice_name=voice_host)
-                                ),
+    response = _retry(lambda: client.models.generate_content(
+        model=model_id,
+        contents=tts_instruction,
+        config=genai_types.GenerateContentConfig(
+            response_modalities=["AUDIO"],
+            speech_config=genai_types.SpeechConfig(
+                multi_speaker_voice_config=genai_types.MultiSpeakerVoiceConfig(
+                    speaker_voice_configs=[
+                        genai_types.SpeakerVoiceConfig(
+                            speaker="Host",
+                            voice_config=genai_types.VoiceConfig(
+                                prebuilt_voice_config=genai_types.PrebuiltVoiceConfig(voice_name=voice_host)
                             ),
-                            genai_types.SpeakerVoiceConfig(
-                                speaker="Guest",
-                                voice_config=genai_types.VoiceConfig(
-                                    prebuilt_voice_config=genai_types.PrebuiltVoiceConfig(voice_name=voice_guest)
-                                ),
+                        ),
+                        genai_types.SpeakerVoiceConfig(
+                            speaker="Guest",
+                            voice_config=genai_types.VoiceConfig(
+                                prebuilt_voice_config=genai_types.PrebuiltVoiceConfig(voice_name=voice_guest)
                             ),
-                        ]
-                    )
-                ),
+                        ),
+                    ]
+                )
             ),
-        ))
-        for part in response.candidates[0].content.parts:
-            if part.inline_data and part.inline_data.data:
-                wav_parts.append(_pcm_to_wav(part.inline_data.data))
-                break
+        ),
+    ), model_id=model_id, deadline=deadline)
+    for part in response.candidates[0].content.parts:
+        if part.inline_data and part.inline_data.data:
+            return part.inline_data.data
+    return None
+
+
+def _podcast_tts_model() -> str:
+    return (
+        MODELS["voice"].get("flash", MODELS["voice"])
+        if isinstance(MODELS["voice"], dict) else MODELS["voice"]
+    )
+
+
+def _pipelined_tts(
+    chunks,
+    voice_host: str,
+    voice_guest: str,
+    client,
+    lang: str = "en",
+    max_workers: int = None,
+    deadline: float = None,
+    on_segment=None,
+) -> bytes:
+    # Synthesize chunks on a bounded pool as the chunks iterator produces
+    # them (it may still be streaming the script), and reassemble in script
+    # order. on_segment(index, wav_bytes) gets each segment, in order, as soon
+    # as it and everything before it are ready, for progressive playback.
+    model_id = _podcast_tts_model()
+    workers = max(1, max_workers or TTS_MAX_CONCURRENCY)
+    wav = WavAssembler()
+    pending = deque()
+    lock = threading.Lock()
+    emitted = 0
+
+    def _cancel_queued():
+        # The podcast fails as a whole, so chunks not started yet would only
+        # spend TTS quota
+        with lock:
+            queued = list(pending)
+        for future in queued:
+            future.cancel()  # runs _drain, so not under the lock
+
+    def _drain(future=None):
+        # Runs whenever a synthesis finishes: emit the finished prefix in
+        # script order. A failed chunk stays at the head for the final check.
+        nonlocal emitted
+        if future is not None and not future.cancelled() and future.exception() is not None:
+            _cancel_queued()
+        with lock:
+            while (pending and pending[0].done() and not pending[0].cancelled()
+                   and pending[0].exception() is None):
+                pcm = pending.popleft().result()
+                if not pcm:
+                    continue
+                wav.add(pcm)
+                if on_segment:
+                    on_segment(emitted, _pcm_to_wav(pcm))
+                emitted += 1
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rcjy-tts") as pool:
+        try:
+            for i, chunk in enumerate(chunks):
+                logger.info("  TTS chunk %d queued (%d words)", i + 1, len(chunk.split()))
+                future = pool.submit(
+                    _tts_dialogue_chunk, chunk, voice_host, voice_guest, model_id, client, lang, deadline,
+                )
+                with lock:
+                    pending.append(future)
+                future.add_done_callback(_drain)
+        except BaseException:
+            _cancel_queued()  # the script stream failed
+            raise
+    _drain()
+    for future in pending:
+        if not future.cancelled():
+            future.result()  # raises the first failed chunk's error
 
-    if not wav_parts:
+    if not emitted:
         raise RuntimeError("No audio generated from any chunk.")
-    return _concat_wavs(wav_parts)
+    return wav.getvalue()
 
 
 def generate_podcast(
@@ -598,7 +942,13 @@ def generate_podcast(
     host_display_name: str = "",
     guest_display_name: str = "",
     lang: str = "en",
+    context: ExtractedContent = None,
+    on_segment=None,
 ) -> tuple[bytes, str]:
+    # Script generation, chunking and TTS are pipelined: the script streams
+    # in, each ~150-word run of speaker turns goes to TTS while the rest is
+    # still being written, and on_segment(index, wav_bytes) receives audio
+    # segments in order as they become playable.
     prompt = _validate_prompt(prompt)
     lang = lang if lang in _ALLOWED_LANGS else "en"
     length = length if length in _ALLOWED_PODCAST_LENGTHS else "short"
@@ -606,9 +956,7 @@ def generate_podcast(
     voice_guest = voice_guest if voice_guest in _ALLOWED_VOICES else "Puck"
     host_display_name = host_display_name[:50].strip()
     guest_display_name = guest_display_name[:50].strip()
-    combined_text, _ = get_content_from_input(text=prompt, url=url, files=files)
-    if context_text and context_text != "No content provided.":
-        combined_text = f"{context_text}\n\n---\n\n{combined_text}"
+    combined_text = _combine_context(prompt, context_text, url, files, context)
 
     target_words = "200-300" if length == "short" else "400-500"
     logger.info("Generating podcast: length=%s, voices=%s/%s, lang=%s", length, voice_host, voice_guest, lang)
@@ -659,23 +1007,28 @@ Content:
 """
 
     client = get_genai_client()
-    script_response = _retry(lambda: client.models.generate_content(
-        model=MODELS["podcast"],
-        contents=script_prompt,
-    ))
-
-    script = script_response.text or ""
-    if not script.strip():
-        raise RuntimeError("Script generation returned empty result.")
-
-    script = script.replace("المقدم:", "Host:").replace("الضيف:", "Guest:")
-
-    words = script.split()
-    if len(words) > 600:
-        logger.warning("Script exceeded limit (%d words), truncating to 600", len(words))
-        script = " ".join(words[:600])
-
-    logger.info("Podcast script ready (%d words), starting TTS", len(script.split()))
-    wav = _multi_speaker_tts(script, voice_host, voice_guest, client, lang=lang)
+    # One retry deadline covers the script and every TTS chunk
+    deadline = time.monotonic() + PODCAST_RETRY_BUDGET
+    started = time.monotonic()
+    script_seen = []
+
+    def _chunks():
+        pieces = _stream_text(client, MODELS["podcast"], script_prompt, deadline=deadline)
+        for chunk in _iter_script_chunks(pieces):
+            script_seen.append(chunk)
+            yield chunk
+        if not script_seen:
+            raise RuntimeError("Script generation returned empty result.")
+        logger.info("Podcast script complete (%d words, %.1fs)",
+                    sum(len(c.split()) for c in script_seen), time.monotonic() - started)
+
+    def _segment(index, wav_bytes):
+        if index == 0:
+            logger.info("Podcast first audio after %.1fs", time.monotonic() - started)
+        if on_segment:
+            on_segment(index, wav_bytes)
+
+    wav = _pipelined_tts(_chunks(), voice_host, voice_guest, client, lang=lang,
+                         deadline=deadline, on_segment=_segment)
     logger.info("Podcast generated (%d bytes)", len(wav))
     return wav, "audio/wav"
@@ -1,27 +1,50 @@
 # GCS-backed history storage
 
+import hashlib
 import json
 import logging
+import os
 import re
+import tempfile
+import threading
+import time
 import uuid
-from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 
-from google.api_core.exceptions import PreconditionFailed, NotFound
+import google.auth
+import google.auth.transport.requests
+from google.api_core.exceptions import NotFound, PreconditionFailed
 from google.cloud import storage
 
+from cache import LRUCache
 from rcjy_config import GCS_HISTORY_BUCKET
+from search_index import SearchIndex, term_counts
+from thumbnails import make_thumbnail, schedule_poster
 
 logger = logging.getLogger("rcjy.history")
 
-INDEX_BLOB = "rcjy-media-history/index.json"
-FILES_PREFIX = "rcjy-media-history/files/"
+INDEX_BLOB = "rcjy-media-history/index.json"  # legacy single-file index, migrated on first use
+ENTRIES_PREFIX = "rcjy-media-history/entries/"
+BY_TYPE_PREFIX = "rcjy-media-history/by-type/"  # per-type secondary index, same object layout
+TYPE_INDEX_READY_BLOB = "rcjy-media-history/by-type/_ready"
+FILES_PREFIX = "rcjy-media-history/files/"  # content-addressed: <sha256><ext>
+REFS_PREFIX = "rcjy-media-history/refs/"  # refs/<filename>/<entry id>: one marker per referencing entry
+THUMBS_PREFIX = "rcjy-media-history/thumbs/"
+SEARCH_PREFIX = "rcjy-media-history/search/"  # per-entry term counts for the search index
 MAX_ENTRIES = 200
-MAX_RETRIES = 3
+DELETE_WORKERS = 8
+SEARCH_LOAD_WORKERS = 8
+SIGNED_URL_MINUTES = 15
 
 # ID format
 _SAFE_ID_RE = re.compile(r"^[a-f0-9]{16}$")
 
+# Entry blobs are named "<inverted µs timestamp>-<id>.json" so a plain
+# prefix listing returns newest first
+_MAX_TS_US = 10 ** 16 - 1
+
 _EXT_MAP = {
     "image/png": ".png",
     "image/jpeg": ".jpg",
@@ -38,6 +61,33 @@ _ALLOWED_LANGS = {"en", "ar", "both"}
 # GCS client cache
 _gcs_client = None
 _bucket = None
+_migrated = False
+_type_index_ready = False
+
+# Default credentials used to sign URLs through IAM when the client's can't
+_signing_creds = None
+_signing_lock = threading.Lock()
+
+# Parsed listing cache. Revalidated against the newest entry blob (entry
+# names sort newest first) and fully relisted after _CACHE_MAX_AGE_SECONDS
+# so removals by other processes show up too. "serial" bumps on every change.
+_CACHE_REVALIDATE_SECONDS = 2.0
+_CACHE_MAX_AGE_SECONDS = 30.0
+_cache_lock = threading.Lock()
+_cache = {"newest": None, "entries": None, "checked": 0.0, "listed": 0.0, "serial": 0}
+
+# Thumbnails are immutable, keep recently shown ones in memory
+_thumb_cache = LRUCache(max_entries=500, max_size=16 * 1024 * 1024)
+
+# In-process search index, synced against the listing whenever it changes
+_search_index = SearchIndex()
+_search_lock = threading.Lock()
+_search_synced_serial = None
+
+# Background prune sweeper
+_prune_event = threading.Event()
+_sweeper_started = False
+_sweeper_lock = threading.Lock()
 
 
 def _validate_entry_id(entry_id: str) -> str:
@@ -57,37 +107,335 @@ def _get_bucket():
     return _bucket
 
 
-def _load_index() -> tuple[list[dict], int]:
-    # Load index from GCS with generation for concurrency control
+def _sort_key(created_at: str) -> str:
     try:
-        bucket = _get_bucket()
-        blob = bucket.blob(INDEX_BLOB)
-        # Download with generation info
-        content = blob.download_as_text(encoding="utf-8")
-        generation = blob.generation
-        return json.loads(content), generation
+        dt = datetime.fromisoformat(created_at)
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        us = int(dt.timestamp() * 1_000_000)
+    except (TypeError, ValueError):
+        us = 0
+    return f"{_MAX_TS_US - us:016d}"
+
+
+def _entry_key(meta: dict) -> str:
+    # Keyset cursor: orders by (created_at desc, id)
+    return f"{_sort_key(meta.get('created_at', ''))}-{meta['id']}"
+
+
+def _entry_blob_name(meta: dict) -> str:
+    return f"{ENTRIES_PREFIX}{_entry_key(meta)}.json"
+
+
+def _type_blob_name(meta: dict) -> str:
+    return f"{BY_TYPE_PREFIX}{meta.get('type', 'unknown')}/{_entry_key(meta)}.json"
+
+
+def _upload_entry_object(name: str, data: str):
+    blob = _get_bucket().blob(name)
+    # Mirror the entry into custom metadata so listings need no per-entry GET
+    blob.metadata = {"entry": data}
+    try:
+        blob.upload_from_string(data, content_type="application/json", if_generation_match=0)
+    except PreconditionFailed:
+        pass  # already written (e.g. migration ran twice)
+
+
+def _write_entry(meta: dict):
+    # Small create-only uploads per entry; no shared index to contend on.
+    # The primary object goes first so the type index never points at nothing.
+    data = json.dumps(meta, ensure_ascii=False)
+    _upload_entry_object(_entry_blob_name(meta), data)
+    _upload_entry_object(_type_blob_name(meta), data)
+
+
+def _meta_from_blob(blob) -> Optional[dict]:
+    try:
+        raw = (blob.metadata or {}).get("entry")
+        if raw is None:
+            raw = blob.download_as_text(encoding="utf-8")
+        return json.loads(raw)
     except NotFound:
-        return [], 0
+        return None
     except Exception:
-        logger.exception("Failed to load history index from GCS")
-        return [], 0
+        logger.warning("Unreadable history entry: %s", blob.name)
+        return None
 
 
-def _save_index(entries: list[dict], expected_generation: int) -> bool:
-    # Save index with optimistic concurrency
-    bucket = _get_bucket()
-    blob = bucket.blob(INDEX_BLOB)
-    data = json.dumps(entries, ensure_ascii=False, indent=1)
+def _list_entries() -> list[dict]:
+    # All entries, newest first (merges every listing page)
+    _migrate_legacy_index()
+    entries = []
+    for blob in _get_bucket().list_blobs(prefix=ENTRIES_PREFIX):
+        meta = _meta_from_blob(blob)
+        if meta and "id" in meta:
+            entries.append(meta)
+    return entries
+
+
+def _newest_entry_name() -> str:
+    # One-item listing: the name of the newest entry blob, "" when empty
+    for blob in _get_bucket().list_blobs(prefix=ENTRIES_PREFIX, max_results=1):
+        return blob.name
+    return ""
+
+
+def _newest_of(entries: list[dict]) -> str:
+    return _entry_blob_name(entries[0]) if entries else ""
+
+
+def _cached_entries() -> list[dict]:
+    # Read-through cache of _list_entries(). A new entry anywhere changes the
+    # newest blob name; anything else is picked up by the periodic relist.
+    now = time.monotonic()
+    with _cache_lock:
+        entries = _cache["entries"]
+        if entries is not None and now - _cache["checked"] < _CACHE_REVALIDATE_SECONDS:
+            return entries
+        fresh = entries is not None and now - _cache["listed"] < _CACHE_MAX_AGE_SECONDS
+    if fresh:
+        newest = _newest_entry_name()
+        with _cache_lock:
+            if _cache["entries"] is not None and _cache["newest"] == newest:
+                _cache["checked"] = now
+                return _cache["entries"]
+    entries = _list_entries()
+    with _cache_lock:
+        _cache.update(newest=_newest_of(entries), entries=entries, checked=now, listed=now,
+                      serial=_cache["serial"] + 1)
+    return entries
+
+
+def _invalidate_cache():
+    with _cache_lock:
+        _cache.update(newest=None, entries=None, checked=0.0, listed=0.0)
+
+
+def _apply_to_cache(apply):
+    # Write-through of our own change to the cached listing. Purely local, so
+    # it never fails a save; other processes see the change through the
+    # newest-entry check or their next full relist.
+    with _cache_lock:
+        if _cache["entries"] is None:
+            return
+        entries = apply(list(_cache["entries"]))
+        _cache.update(newest=_newest_of(entries), entries=entries, checked=time.monotonic(),
+                      serial=_cache["serial"] + 1)
+
+
+def _find_entry(entry_id: str) -> Optional[dict]:
+    meta = next((e for e in _cached_entries() if e.get("id") == entry_id), None)
+    if meta is not None:
+        return meta
+    # Fall back to a direct lookup in case the cache predates the entry
+    blobs = _get_bucket().list_blobs(
+        prefix=ENTRIES_PREFIX, match_glob=f"{ENTRIES_PREFIX}*-{entry_id}.json",
+    )
+    for blob in blobs:
+        meta = _meta_from_blob(blob)
+        if meta and meta.get("id") == entry_id:
+            return meta
+    return None
+
+
+def _delete_blobs(blob_names: list[str], versions: Optional[dict] = None) -> list[str]:
+    # Delete blobs concurrently; missing blobs count as deleted. versions maps
+    # a name to the (generation, metageneration) it may be deleted at; a blob
+    # changed since then is left alone.
+    # Returns the names that could not be deleted.
+    # One DELETE per blob on a small pool rather than a JSON batch request: a
+    # batch does return a status per sub-request, but the client only exposes
+    # those through Batch internals and doesn't retry failed sub-requests,
+    # while each outcome here (missing, changed, failed) decides what is kept.
+    def _delete(name):
+        generation, metageneration = (versions or {}).get(name, (None, None))
+        try:
+            _get_bucket().blob(name).delete(
+                if_generation_match=generation, if_metageneration_match=metageneration,
+            )
+        except NotFound:
+            pass
+        except PreconditionFailed:
+            logger.info("Blob %s changed since it was checked, kept", name)
+            return name
+        except Exception as e:
+            logger.warning("Could not delete blob %s: %s", name, type(e).__name__)
+            return name
+        return None
+
+    if not blob_names:
+        return []
+    if len(blob_names) == 1:
+        failed = [_delete(blob_names[0])]
+    else:
+        workers = min(DELETE_WORKERS, len(blob_names))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rcjy-hist-del") as pool:
+            failed = list(pool.map(_delete, blob_names))
+    return [name for name in failed if name]
+
+
+def _ref_name(filename: str, entry_id: str) -> str:
+    return f"{REFS_PREFIX}{filename}/{entry_id}"
+
+
+def _has_refs(filename: str) -> bool:
+    return any(True for _ in _get_bucket().list_blobs(prefix=f"{REFS_PREFIX}{filename}/", max_results=1))
+
+
+def _unreferenced(metas: list[dict]) -> dict:
+    # Content-addressed filenames among metas that no entry references any
+    # more, mapped to the file's (generation, metageneration) read *before*
+    # the refs check, or None if the file is already gone. A save that adds
+    # a ref after that check bumps the metageneration (see _claim_file), so a
+    # delete at this version fails instead of removing a file still in use.
+    def _check(name):
+        blob = _get_bucket().blob(f"{FILES_PREFIX}{name}")
+        try:
+            blob.reload()
+            version = (blob.generation, blob.metageneration)
+        except NotFound:
+            version = None
+        return _has_refs(name), version
+
+    filenames = {m["filename"] for m in metas if m.get("sha256") and m.get("filename")}
+    if not filenames:
+        return {}
+    names = sorted(filenames)
+    workers = min(DELETE_WORKERS, len(names))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rcjy-hist-refs") as pool:
+        checked = list(pool.map(_check, names))
+    return {name: version for name, (referenced, version) in zip(names, checked) if not referenced}
+
+
+def _claim_file(blob, payload: bytes, mime: str) -> bool:
+    # Make sure a content file survives concurrent deletes once our ref is
+    # written: touching its metadata makes any delete that checked refs before
+    # ours fail its precondition, and a file already deleted is uploaded again.
+    # Returns True when the file was already stored (deduplicated).
+    for _ in range(3):
+        try:
+            blob.metadata = {"claimed": datetime.now(timezone.utc).isoformat()}
+            blob.patch()
+            return True
+        except NotFound:
+            pass
+        try:
+            blob.upload_from_string(payload, content_type=mime, if_generation_match=0)
+            return False
+        except PreconditionFailed:
+            pass  # uploaded concurrently by an identical save; claim that one
+    blob.upload_from_string(payload, content_type=mime)
+    return False
+
+
+def _remove_entries(metas: list[dict]) -> tuple[set, list[str]]:
+    # Drop the entries' refs, delete files (and their thumbnails) nothing else
+    # references, then metadata for entries whose file is gone or still shared,
+    # so a failure never leaves an entry pointing at a deleted file.
+    # Entries saved before dedup own their file and thumbnail outright.
+    # Returns (removed entry ids, failed blob names).
+    failed_refs = set(_delete_blobs([_ref_name(m["filename"], m["id"]) for m in metas if m.get("sha256")]))
+    metas = [m for m in metas if not m.get("sha256") or _ref_name(m["filename"], m["id"]) not in failed_refs]
+    orphaned = _unreferenced(metas)
+    owned = [m for m in metas if m.get("filename") and (not m.get("sha256") or m["filename"] in orphaned)]
+    # Content files already gone are not deleted blind: a save may be
+    # uploading them again right now
+    versions = {f"{FILES_PREFIX}{name}": version for name, version in orphaned.items() if version}
+    file_names = {f"{FILES_PREFIX}{m['filename']}" for m in owned
+                  if not m.get("sha256") or f"{FILES_PREFIX}{m['filename']}" in versions}
+    failed_files = set(_delete_blobs(sorted(file_names), versions))
+    # A file that could not be deleted but is referenced again was claimed by
+    # a concurrent save: it stays, shared, and our entries can still go
+    shared = {name for name in failed_files
+              if name in versions and _has_refs(name[len(FILES_PREFIX):])}
+    failed_files -= shared
+    deletable = [m for m in metas if f"{FILES_PREFIX}{m.get('filename')}" not in failed_files]
+    owned_thumbs = {f"{THUMBS_PREFIX}{m['thumb']}" for m in owned if m.get("thumb")
+                    and f"{FILES_PREFIX}{m['filename']}" not in failed_files | shared}
+    failed_entries = set(_delete_blobs(
+        [_entry_blob_name(m) for m in deletable]
+        + [_type_blob_name(m) for m in deletable]
+        + sorted(owned_thumbs)
+        + [f"{SEARCH_PREFIX}{m['id']}.json" for m in deletable]
+    ))
+    removed = {m["id"] for m in deletable if _entry_blob_name(m) not in failed_entries}
+    for entry_id in removed:
+        _search_index.remove(entry_id)
+    return removed, sorted(failed_files | failed_entries)
+
+
+def _migrate_legacy_index():
+    # Split the old single index.json into per-entry objects (once per process)
+    global _migrated
+    if _migrated:
+        return
     try:
-        blob.upload_from_string(
-            data,
-            content_type="application/json",
-            if_generation_match=expected_generation,
-        )
-        return True
-    except PreconditionFailed:
-        # Another instance updated the index concurrently
-        return False
+        blob = _get_bucket().blob(INDEX_BLOB)
+        content = blob.download_as_text(encoding="utf-8")
+        generation = blob.generation
+        legacy = json.loads(content)
+        for meta in legacy:
+            if isinstance(meta, dict) and _SAFE_ID_RE.match(str(meta.get("id", ""))):
+                _write_entry(meta)
+        blob.delete(if_generation_match=generation)
+        _invalidate_cache()
+        logger.info("Migrated %d history entries from legacy index", len(legacy))
+    except (NotFound, PreconditionFailed):
+        pass
+    except Exception:
+        logger.exception("Legacy history index migration failed")
+        return
+    _migrated = True
+
+
+def _ensure_type_index():
+    # Backfill per-type index objects for entries written before it existed
+    global _type_index_ready
+    if _type_index_ready:
+        return
+    ready = _get_bucket().blob(TYPE_INDEX_READY_BLOB)
+    if not ready.exists():
+        for meta in _list_entries():
+            _upload_entry_object(_type_blob_name(meta), json.dumps(meta, ensure_ascii=False))
+        try:
+            ready.upload_from_string("1", content_type="text/plain", if_generation_match=0)
+        except PreconditionFailed:
+            pass
+        logger.info("History type index backfilled")
+    _type_index_ready = True
+
+
+def _prune():
+    # Drop entries beyond MAX_ENTRIES (oldest first)
+    old = _cached_entries()[MAX_ENTRIES:]
+    if not old:
+        return
+    removed, failed = _remove_entries(old)
+    if removed:
+        _apply_to_cache(lambda entries: [e for e in entries if e["id"] not in removed])
+        logger.info("History pruned: %d entries", len(removed))
+    if failed:
+        logger.warning("History prune left %d blobs: %s", len(failed), ", ".join(failed))
+
+
+def _sweeper_loop():
+    while True:
+        _prune_event.wait()
+        _prune_event.clear()
+        try:
+            _prune()
+        except Exception:
+            logger.exception("History prune failed")
+
+
+def _schedule_prune():
+    # Wake the background sweeper; pruning stays off the caller's save path
+    global _sweeper_started
+    with _sweeper_lock:
+        if not _sweeper_started:
+            threading.Thread(target=_sweeper_loop, name="rcjy-hist-sweeper", daemon=True).start()
+            _sweeper_started = True
+    _prune_event.set()
 
 
 def is_available() -> bool:
@@ -101,6 +449,100 @@ def is_available() -> bool:
         return False
 
 
+def _upload_thumb(name: str, data: bytes, mime: str) -> bool:
+    # Create-only: thumbnails are content-addressed like their files
+    try:
+        _get_bucket().blob(f"{THUMBS_PREFIX}{name}").upload_from_string(
+            data, content_type=mime, if_generation_match=0,
+        )
+    except PreconditionFailed:
+        pass
+    except Exception:
+        logger.warning("Thumbnail upload failed for %s", name)
+        return False
+    return True
+
+
+def _store_entry(
+    content_type: str,
+    prompt: str,
+    data,
+    mime: str,
+    settings: Optional[dict] = None,
+    lang: str = "en",
+) -> dict:
+    # Upload file, thumbnail and entry objects; the caller updates the cached listing
+    entry_id = uuid.uuid4().hex[:16]
+    payload = data.encode("utf-8") if isinstance(data, str) else data
+    digest = hashlib.sha256(payload).hexdigest()
+    ext = _EXT_MAP.get(mime, ".bin")
+    filename = f"{digest}{ext}"
+    file_size = len(payload)
+
+    # Sanitize
+    content_type = content_type if content_type in _ALLOWED_TYPES else "unknown"
+    lang = lang if lang in _ALLOWED_LANGS else "en"
+
+    # Build metadata; the thumbnail is filled in below
+    now = datetime.now(timezone.utc)
+    meta = {
+        "id": entry_id,
+        "type": content_type,
+        "prompt": prompt[:500],
+        "mime": mime,
+        "filename": filename,
+        "sha256": digest,
+        "file_size": file_size,
+        "settings": settings or {},
+        "lang": lang,
+        "created_at": now.isoformat(),
+        "preview": (data[:300] if isinstance(data, str) else ""),
+        "thumb": None,
+        "thumb_mime": None,
+    }
+
+    # Reference first, then claim the file: a concurrent delete of the last
+    # other reference either sees our ref or fails its delete precondition
+    bucket = _get_bucket()
+    ref_blob = bucket.blob(_ref_name(filename, entry_id))
+    ref_blob.upload_from_string(b"", content_type="application/octet-stream")
+
+    # From here on a failure removes what this save wrote: our ref, and the
+    # file and thumbnail if nothing else references them, so no orphan ref
+    # pins the shared file forever
+    try:
+        # Identical payloads are stored once; a duplicate skips the upload
+        file_blob = bucket.blob(f"{FILES_PREFIX}{filename}")
+        if _claim_file(file_blob, payload, mime):
+            logger.info("History file deduplicated: %s", filename)
+            meta["thumb"], meta["thumb_mime"] = _shared_thumb(filename)
+
+        # Small preview next to the file (best effort), shared like the file.
+        # Video posters are made in the background; until one is uploaded the
+        # thumbnail simply reads as missing.
+        if meta["thumb"] is None and mime.startswith("video/"):
+            poster_name = f"{digest}.webp"
+            if schedule_poster(
+                file_blob.download_as_bytes,
+                lambda poster: _upload_thumb(poster_name, poster, "image/webp"),
+            ):
+                meta["thumb"], meta["thumb_mime"] = poster_name, "image/webp"
+        elif meta["thumb"] is None:
+            thumb, thumb_mime, thumb_ext = make_thumbnail(data, mime)
+            if thumb and _upload_thumb(f"{digest}{thumb_ext}", thumb, thumb_mime):
+                meta["thumb"], meta["thumb_mime"] = f"{digest}{thumb_ext}", thumb_mime
+
+        _write_entry(meta)
+    except Exception:
+        try:
+            _remove_entries([meta])
+        except Exception:
+            logger.warning("Cleanup after a failed history save failed: %s", entry_id)
+        raise
+    _index_entry(meta, data if isinstance(data, str) else "")
+    return meta
+
+
 def save_entry(
     content_type: str,
     prompt: str,
@@ -111,71 +553,54 @@ def save_entry(
 ) -> Optional[str]:
     # Save generated content to GCS
     try:
-        entry_id = uuid.uuid4().hex[:16]
-        ext = _EXT_MAP.get(mime, ".bin")
-        filename = f"{entry_id}{ext}"
-        blob_name = f"{FILES_PREFIX}{filename}"
-
-        # Upload file
-        bucket = _get_bucket()
-        file_blob = bucket.blob(blob_name)
+        meta = _store_entry(content_type, prompt, data, mime, settings, lang)
+        _apply_to_cache(lambda entries: [meta] + entries)
+        logger.info("History saved: %s (%s, %s)", meta["id"], meta["type"], format_file_size(meta["file_size"]))
 
-        if isinstance(data, str):
-            file_blob.upload_from_string(data, content_type=mime)
-            file_size = len(data.encode("utf-8"))
-        else:
-            file_blob.upload_from_string(data, content_type=mime)
-            file_size = len(data)
-
-        # Sanitize
-        content_type = content_type if content_type in _ALLOWED_TYPES else "unknown"
-        lang = lang if lang in _ALLOWED_LANGS else "en"
-
-        # Build metadata
-        now = datetime.now(timezone.utc)
-        meta = {
-            "id": entry_id,
-            "type": content_type,
-            "prompt": prompt[:500],
-            "mime": mime,
-            "filename": filename,
-            "file_size": file_size,
-            "settings": settings or {},
-            "lang": lang,
-            "created_at": now.isoformat(),
-            "preview": (data[:300] if isinstance(data, str) else ""),
-        }
+        _schedule_prune()
+        return meta["id"]
+    except Exception:
+        logger.exception("History save failed")
+        return None
 
-        # Retry loop for index update
-        for attempt in range(MAX_RETRIES):
-            entries, generation = _load_index()
-            entries.insert(0, meta)
 
-            # Prune old entries
-            if len(entries) > MAX_ENTRIES:
-                for old in entries[MAX_ENTRIES:]:
-                    _delete_file_blob(old.get("filename", ""))
-                entries = entries[:MAX_ENTRIES]
+def save_entries(items: list[dict]) -> list[Optional[str]]:
+    # Save several results at once (e.g. image variants): uploads run
+    # concurrently and the cached listing is updated once.
+    # items: dicts with save_entry's arguments. Returns ids in item order,
+    # None for items that failed.
+    def _store(item):
+        try:
+            return _store_entry(**item)
+        except Exception:
+            logger.exception("History save failed")
+            return None
 
-            if _save_index(entries, generation):
-                logger.info("History saved: %s (%s, %s)", entry_id, content_type, format_file_size(file_size))
-                return entry_id
+    if not items:
+        return []
+    workers = min(DELETE_WORKERS, len(items))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rcjy-hist-save") as pool:
+        metas = list(pool.map(_store, items))
+    saved = sorted((m for m in metas if m), key=lambda m: m["created_at"], reverse=True)
+    if saved:
+        _apply_to_cache(lambda entries: saved + entries)
+        logger.info("History saved: %d entries in one batch", len(saved))
+        _schedule_prune()
+    return [m["id"] if m else None for m in metas]
 
-            logger.warning("Index conflict on save (attempt %d), retrying", attempt + 1)
 
-        # All retries failed, clean up
-        logger.error("Failed to update index after %d retries", MAX_RETRIES)
-        file_blob.delete()
-        return None
-    except Exception:
-        logger.exception("History save failed")
-        return None
+def _shared_thumb(filename: str) -> tuple:
+    # (thumb, thumb_mime) of another entry with the same content, if known
+    for e in _cached_entries():
+        if e.get("filename") == filename and e.get("thumb"):
+            return e["thumb"], e.get("thumb_mime")
+    return None, None
 
 
 def get_entries(content_type: Optional[str] = None, limit: int = 50) -> list[dict]:
     # Return history entries, newest first
     try:
-        entries, _ = _load_index()
+        entries = _cached_entries()
         if content_type:
             entries = [e for e in entries if e.get("type") == content_type]
         return entries[:limit]
@@ -184,28 +609,175 @@ def get_entries(content_type: Optional[str] = None, limit: int = 50) -> list[dic
         return []
 
 
-def load_file(entry_id: str) -> tuple:
-    # Load generated file from GCS
+def _index_entry(meta: dict, text: str = ""):
+    # Persist the entry's term counts next to it and add them to the index
+    terms = term_counts(f"{meta.get('prompt', '')}\n{text}")
     try:
-        entry_id = _validate_entry_id(entry_id)
-        entries, _ = _load_index()
-        meta = next((e for e in entries if e["id"] == entry_id), None)
-        if meta is None:
-            return None, None, None
+        _get_bucket().blob(f"{SEARCH_PREFIX}{meta['id']}.json").upload_from_string(
+            json.dumps(terms, ensure_ascii=False), content_type="application/json",
+        )
+    except Exception:
+        logger.warning("Search terms upload failed for %s", meta["id"])
+    _search_index.add(meta["id"], terms)
 
-        blob_name = f"{FILES_PREFIX}{meta['filename']}"
-        bucket = _get_bucket()
-        blob = bucket.blob(blob_name)
 
-        if not blob.exists():
-            return None, None, None
+def _load_search_terms(meta: dict):
+    # Term counts for an entry indexed elsewhere; rebuilt for entries that predate the index
+    try:
+        return json.loads(_get_bucket().blob(f"{SEARCH_PREFIX}{meta['id']}.json").download_as_bytes())
+    except NotFound:
+        pass
+    text = ""
+    if meta.get("type") == "text" and meta.get("filename"):
+        try:
+            text = _get_bucket().blob(f"{FILES_PREFIX}{meta['filename']}").download_as_text(encoding="utf-8")
+        except NotFound:
+            pass
+    _index_entry(meta, text)
+    return None
+
+
+def _sync_search_index(entries: list[dict]):
+    # Bring the in-process index in line with the listing: drop deleted ids and
+    # fetch term counts only for entries not yet indexed. Skipped entirely
+    # while the cached listing is unchanged.
+    global _search_synced_serial
+    with _cache_lock:
+        serial = _cache["serial"]
+    if serial == _search_synced_serial:
+        return
+    with _search_lock:
+        current = {e["id"] for e in entries}
+        for entry_id in _search_index.doc_ids() - current:
+            _search_index.remove(entry_id)
+        missing = [e for e in entries if e["id"] not in _search_index]
+        if missing:
+            workers = min(SEARCH_LOAD_WORKERS, len(missing))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rcjy-hist-search") as pool:
+                for meta, terms in zip(missing, pool.map(_load_search_terms, missing)):
+                    if terms is not None:
+                        _search_index.add(meta["id"], terms)
+        _search_synced_serial = serial
+
+
+def search(query: str, content_type: Optional[str] = None, limit: int = 50) -> list[dict]:
+    # Full-text search over prompts and text outputs, best matches first
+    try:
+        entries = _cached_entries()
+        _sync_search_index(entries)
+        by_id = {e["id"]: e for e in entries}
+        results = []
+        for entry_id, _score in _search_index.search(query):
+            meta = by_id.get(entry_id)
+            if meta is None or (content_type and meta.get("type") != content_type):
+                continue
+            results.append(meta)
+            if len(results) >= limit:
+                break
+        return results
+    except Exception:
+        logger.exception("History search failed")
+        return []
+
+
+def _resolve_file(entry_id: str) -> Optional[tuple]:
+    # (blob, mime, download name) for an entry, without touching the file
+    entry_id = _validate_entry_id(entry_id)
+    meta = _find_entry(entry_id)
+    if meta is None:
+        return None
+    blob = _get_bucket().blob(f"{FILES_PREFIX}{meta['filename']}")
+    mime = meta.get("mime", "application/octet-stream")
+    ext = _EXT_MAP.get(mime, ".bin")
+    dl_name = f"rcjy_{meta['type']}_{entry_id[:8]}{ext}"
+    return blob, mime, dl_name
+
+
+def _bound_key(value) -> str:
+    # datetime or ISO string -> sort-key prefix
+    return _sort_key(value.isoformat() if isinstance(value, datetime) else str(value))
+
+
+def get_page(
+    content_type: Optional[str] = None,
+    limit: int = 20,
+    after: Optional[str] = None,
+    since=None,
+    until=None,
+) -> tuple[list[dict], Optional[str]]:
+    # Keyset-paginated listing, newest first. `after` is the cursor returned
+    # by the previous page (encodes created_at and id); since/until bound
+    # created_at. Each page is one ranged listing of at most limit+1 objects,
+    # so cost does not grow with total history size.
+    # Returns (entries, next_cursor); next_cursor is None on the last page.
+    try:
+        limit = max(1, min(int(limit), 200))
+        if content_type:
+            if content_type not in _ALLOWED_TYPES:
+                return [], None
+            _migrate_legacy_index()
+            _ensure_type_index()
+            prefix = f"{BY_TYPE_PREFIX}{content_type}/"
+        else:
+            _migrate_legacy_index()
+            prefix = ENTRIES_PREFIX
+
+        start = None
+        if after:
+            # Names sort as "<key>.json"; "." < any key char, so this skips the cursor itself
+            start = f"{prefix}{after}/"
+        if until is not None:
+            until_start = f"{prefix}{_bound_key(until)}"
+            start = max(start, until_start) if start else until_start
+        # "~" sorts after "-<id>.json", so entries exactly at `since` are kept
+        end = f"{prefix}{_bound_key(since)}~" if since is not None else None
+
+        entries = []
+        for blob in _get_bucket().list_blobs(
+            prefix=prefix, start_offset=start, end_offset=end, max_results=limit + 1,
+        ):
+            meta = _meta_from_blob(blob)
+            if meta and "id" in meta:
+                entries.append(meta)
+        next_cursor = _entry_key(entries[limit - 1]) if len(entries) > limit else None
+        return entries[:limit], next_cursor
+    except Exception:
+        logger.exception("History get_page failed")
+        return [], None
 
-        mime = meta.get("mime", "application/octet-stream")
-        ext = _EXT_MAP.get(mime, ".bin")
-        dl_name = f"rcjy_{meta['type']}_{entry_id[:8]}{ext}"
 
+def load_thumbnail(entry_id: str) -> tuple:
+    # Return (bytes, mime) of an entry's preview image, or (None, None)
+    try:
+        entry_id = _validate_entry_id(entry_id)
+        meta = _find_entry(entry_id)
+        if not meta or not meta.get("thumb"):
+            return None, None
+        name = f"{THUMBS_PREFIX}{meta['thumb']}"
+        data = _thumb_cache.get(name)
+        if data is None:
+            data = _get_bucket().blob(name).download_as_bytes()
+            _thumb_cache.set(name, data)
+        return data, meta.get("thumb_mime") or "image/webp"
+    except NotFound:
+        return None, None
+    except Exception:
+        logger.warning("History load_thumbnail failed: %s", entry_id)
+        return None, None
+
+
+def load_file(entry_id: str) -> tuple:
+    # Load generated file from GCS (whole payload; prefer load_file_to_path for media)
+    try:
+        resolved = _resolve_file(entry_id)
+        if resolved is None:
+            return None, None, None
+        blob, mime, dl_name = resolved
+        # A missing blob surfaces as NotFound from the download itself
         data = blob.download_as_bytes()
         return data, mime, dl_name
+    except NotFound:
+        return None, None, None
     except ValueError as ve:
         logger.warning("Invalid entry_id in load_file: %s", ve)
         return None, None, None
@@ -214,27 +786,91 @@ def load_file(entry_id: str) -> tuple:
         return None, None, None
 
 
-def delete_entry(entry_id: str) -> bool:
-    # Delete single history entry
+def load_file_to_path(entry_id: str) -> tuple:
+    # Spill a file to a temp path (streamed to disk). Caller removes the file.
+    # Returns (path, mime, dl_name)
+    tmp_path = None
     try:
-        entry_id = _validate_entry_id(entry_id)
-
-        for attempt in range(MAX_RETRIES):
-            entries, generation = _load_index()
-            meta = next((e for e in entries if e["id"] == entry_id), None)
-            if meta is None:
-                return False
+        resolved = _resolve_file(entry_id)
+        if resolved is None:
+            return None, None, None
+        blob, mime, dl_name = resolved
+        fd, tmp_path = tempfile.mkstemp(suffix=os.path.splitext(dl_name)[1], prefix="rcjy_hist_")
+        with os.fdopen(fd, "wb") as f:
+            blob.download_to_file(f)
+        return tmp_path, mime, dl_name
+    except Exception as e:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        if isinstance(e, ValueError):
+            logger.warning("Invalid entry_id in load_file_to_path: %s", e)
+        elif not isinstance(e, NotFound):
+            logger.exception("History load_file_to_path failed: %s", entry_id)
+        return None, None, None
 
-            _delete_file_blob(meta.get("filename", ""))
-            entries = [e for e in entries if e["id"] != entry_id]
 
-            if _save_index(entries, generation):
-                logger.info("History deleted: %s", entry_id)
-                return True
+def _signing_credentials():
+    # Application default credentials, refreshed when expired, so their
+    # service account email and token can drive IAM signBlob signing
+    global _signing_creds
+    with _signing_lock:
+        if _signing_creds is None:
+            _signing_creds, _ = google.auth.default(
+                scopes=["https://www.googleapis.com/auth/cloud-platform"],
+            )
+        if not _signing_creds.valid:
+            _signing_creds.refresh(google.auth.transport.requests.Request())
+        return _signing_creds
+
+
+def get_file_url(entry_id: str, download: bool = False) -> tuple:
+    # Short-lived signed URL so the browser streams media straight from GCS.
+    # Returns (url, mime, dl_name); url is None when the credentials cannot
+    # sign, and callers fall back to bytes.
+    try:
+        resolved = _resolve_file(entry_id)
+        if resolved is None:
+            return None, None, None
+        blob, mime, dl_name = resolved
+        kwargs = {
+            "version": "v4",
+            "expiration": timedelta(minutes=SIGNED_URL_MINUTES),
+            "method": "GET",
+            "response_type": mime,
+        }
+        if download:
+            kwargs["response_disposition"] = f'attachment; filename="{dl_name}"'
+        try:
+            return blob.generate_signed_url(**kwargs), mime, dl_name
+        except AttributeError:
+            # Token-only credentials (e.g. Cloud Run): sign via the IAM API
+            creds = _signing_credentials()
+            url = blob.generate_signed_url(
+                service_account_email=creds.service_account_email,
+                access_token=creds.token,
+                **kwargs,
+            )
+            return url, mime, dl_name
+    except Exception as e:
+        logger.debug("Signed URL unavailable for %s: %s", entry_id, type(e).__name__)
+        return None, None, None
 
-            logger.warning("Index conflict on delete (attempt %d), retrying", attempt + 1)
 
-        return False
+def delete_entry(entry_id: str) -> bool:
+    # Delete single history entry
+    try:
+        entry_id = _validate_entry_id(entry_id)
+        meta = _find_entry(entry_id)
+        if meta is None:
+            return False
+        removed, failed = _remove_entries([meta])
+        if failed:
+            logger.warning("History delete incomplete for %s: %s", entry_id, ", ".join(failed))
+        if not removed:
+            return False
+        _apply_to_cache(lambda entries: [e for e in entries if e["id"] != entry_id])
+        logger.info("History deleted: %s", entry_id)
+        return True
     except ValueError as ve:
         logger.warning("Invalid entry_id in delete_entry: %s", ve)
         return False
@@ -246,23 +882,15 @@ def delete_entry(entry_id: str) -> bool:
 def clear_all() -> int:
     # Delete all history entries
     try:
-        for attempt in range(MAX_RETRIES):
-            entries, generation = _load_index()
-            count = len(entries)
-            if count == 0:
-                return 0
-
-            # Delete all blobs
-            for e in entries:
-                _delete_file_blob(e.get("filename", ""))
-
-            if _save_index([], generation):
-                logger.info("History cleared: %d entries", count)
-                return count
-
-            logger.warning("Index conflict on clear (attempt %d), retrying", attempt + 1)
-
-        return 0
+        entries = _list_entries()
+        if not entries:
+            return 0
+        removed, failed = _remove_entries(entries)
+        _apply_to_cache(lambda current: [e for e in current if e["id"] not in removed])
+        logger.info("History cleared: %d entries", len(removed))
+        if failed:
+            logger.warning("History clear left %d blobs: %s", len(failed), ", ".join(failed))
+        return len(removed)
     except Exception:
         logger.exception("History clear_all failed")
         return 0
@@ -271,7 +899,7 @@ def clear_all() -> int:
 def get_stats() -> dict:
     # Return history stats
     try:
-        entries, _ = _load_index()
+        entries = _cached_entries()
         total = len(entries)
         total_size = sum(e.get("file_size", 0) for e in entries)
         by_type = {}
@@ -284,21 +912,6 @@ def get_stats() -> dict:
         return {"total": 0, "total_size": 0, "by_type": {}}
 
 
-
-def _delete_file_blob(filename: str):
-    # Delete file blob, ignore if missing
-    if not filename:
-        return
-    try:
-        blob_name = f"{FILES_PREFIX}{filename}"
-        bucket = _get_bucket()
-        bucket.blob(blob_name).delete()
-    except NotFound:
-        pass
-    except Exception:
-        logger.warning("Could not delete blob: %s", filename)
-
-
 def format_file_size(size_bytes: int) -> str:
     if size_bytes < 1024:
         return f"{size_bytes} B"
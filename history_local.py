@@ -1,11 +1,17 @@
 # In-memory history fallback (persists across page reloads via cache_resource)
 
+import hashlib
+import os
+import tempfile
 import uuid
 from datetime import datetime, timezone
 from typing import Optional
 
 import streamlit as st
 
+from search_index import SearchIndex
+from thumbnails import make_thumbnail, schedule_poster
+
 MAX_ENTRIES = 100
 
 _EXT_MAP = {
@@ -21,7 +27,7 @@ _EXT_MAP = {
 
 @st.cache_resource
 def _get_store() -> dict:
-    return {"entries": [], "files": {}}
+    return {"entries": [], "files": {}, "thumbs": {}, "search": SearchIndex()}
 
 
 def is_available() -> bool:
@@ -41,10 +47,23 @@ def save_entry(
     ext = _EXT_MAP.get(mime, ".bin")
     filename = f"{entry_id}{ext}"
 
-    if isinstance(data, str):
-        file_size = len(data.encode("utf-8"))
+    payload = data.encode("utf-8") if isinstance(data, str) else data
+    file_size = len(payload)
+    digest = hashlib.sha256(payload).hexdigest()
+
+    # Identical payloads share one stored object and thumbnail
+    twin = next((e for e in store["entries"] if e.get("sha256") == digest), None)
+    if twin is not None and twin["id"] in store["files"]:
+        data = store["files"][twin["id"]]
+        thumb = store["thumbs"].get(twin["id"])
+        thumb_mime, thumb_ext = twin.get("thumb_mime"), os.path.splitext(twin.get("thumb") or "")[1]
+    elif mime.startswith("video/"):
+        # Poster made in the background; the thumbnail is missing until then
+        thumb, thumb_mime, thumb_ext = None, None, None
+        if schedule_poster(lambda: payload, lambda poster: _store_poster(store, entry_id, poster)):
+            thumb_mime, thumb_ext = "image/webp", ".webp"
     else:
-        file_size = len(data)
+        thumb, thumb_mime, thumb_ext = make_thumbnail(data, mime)
 
     meta = {
         "id": entry_id,
@@ -52,24 +71,42 @@ def save_entry(
         "prompt": prompt[:500],
         "mime": mime,
         "filename": filename,
+        "sha256": digest,
         "file_size": file_size,
         "settings": settings or {},
         "lang": lang,
         "created_at": datetime.now(timezone.utc).isoformat(),
         "preview": (data[:300] if isinstance(data, str) else ""),
+        "thumb": f"{entry_id}{thumb_ext}" if thumb_mime else None,
+        "thumb_mime": thumb_mime,
     }
 
     store["entries"].insert(0, meta)
     store["files"][entry_id] = data
+    if thumb:
+        store["thumbs"][entry_id] = thumb
+    store["search"].add_text(entry_id, f"{meta['prompt']}\n{data if isinstance(data, str) else ''}")
 
     if len(store["entries"]) > MAX_ENTRIES:
         for old in store["entries"][MAX_ENTRIES:]:
             store["files"].pop(old["id"], None)
+            store["thumbs"].pop(old["id"], None)
+            store["search"].remove(old["id"])
         store["entries"] = store["entries"][:MAX_ENTRIES]
 
     return entry_id
 
 
+def _store_poster(store: dict, entry_id: str, poster: bytes):
+    # Background poster result; dropped if the entry was pruned meanwhile
+    if any(e["id"] == entry_id for e in store["entries"]):
+        store["thumbs"][entry_id] = poster
+
+
+def save_entries(items: list[dict]) -> list[Optional[str]]:
+    return [save_entry(**item) for item in items]
+
+
 def get_entries(content_type: Optional[str] = None, limit: int = 50) -> list[dict]:
     store = _get_store()
     entries = store["entries"]
@@ -78,6 +115,58 @@ def get_entries(content_type: Optional[str] = None, limit: int = 50) -> list[dic
     return entries[:limit]
 
 
+def _iso(value) -> str:
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def get_page(
+    content_type: Optional[str] = None,
+    limit: int = 20,
+    after: Optional[str] = None,
+    since=None,
+    until=None,
+) -> tuple[list[dict], Optional[str]]:
+    # Same contract as history.get_page; the cursor is "<created_at>|<id>"
+    entries = get_entries(content_type, limit=MAX_ENTRIES)
+    if after:
+        at, _, last_id = after.partition("|")
+        entries = [
+            e for e in entries
+            if e.get("created_at", "") < at or (e.get("created_at", "") == at and e["id"] > last_id)
+        ]
+    if until is not None:
+        entries = [e for e in entries if e.get("created_at", "") <= _iso(until)]
+    if since is not None:
+        entries = [e for e in entries if e.get("created_at", "") >= _iso(since)]
+    limit = max(1, min(int(limit), 200))
+    last = entries[limit - 1] if len(entries) > limit else None
+    next_cursor = f"{last.get('created_at', '')}|{last['id']}" if last else None
+    return entries[:limit], next_cursor
+
+
+def search(query: str, content_type: Optional[str] = None, limit: int = 50) -> list[dict]:
+    store = _get_store()
+    by_id = {e["id"]: e for e in store["entries"]}
+    results = []
+    for entry_id, _score in store["search"].search(query):
+        meta = by_id.get(entry_id)
+        if meta is None or (content_type and meta.get("type") != content_type):
+            continue
+        results.append(meta)
+        if len(results) >= limit:
+            break
+    return results
+
+
+def load_thumbnail(entry_id: str) -> tuple:
+    store = _get_store()
+    meta = next((e for e in store["entries"] if e["id"] == entry_id), None)
+    thumb = store["thumbs"].get(entry_id)
+    if meta is None or thumb is None:
+        return None, None
+    return thumb, meta.get("thumb_mime") or "image/webp"
+
+
 def load_file(entry_id: str) -> tuple:
     store = _get_store()
     meta = next((e for e in store["entries"] if e["id"] == entry_id), None)
@@ -92,6 +181,25 @@ def load_file(entry_id: str) -> tuple:
     return data, mime, dl_name
 
 
+def _as_bytes(data) -> bytes:
+    return data.encode("utf-8") if isinstance(data, str) else data
+
+
+def load_file_to_path(entry_id: str) -> tuple:
+    data, mime, dl_name = load_file(entry_id)
+    if data is None:
+        return None, None, None
+    fd, tmp_path = tempfile.mkstemp(suffix=os.path.splitext(dl_name)[1], prefix="rcjy_hist_")
+    with os.fdopen(fd, "wb") as f:
+        f.write(_as_bytes(data))
+    return tmp_path, mime, dl_name
+
+
+def get_file_url(entry_id: str, download: bool = False) -> tuple:
+    # In-memory store has no URLs; callers fall back to bytes
+    return None, None, None
+
+
 def delete_entry(entry_id: str) -> bool:
     store = _get_store()
     meta = next((e for e in store["entries"] if e["id"] == entry_id), None)
@@ -99,6 +207,8 @@ def delete_entry(entry_id: str) -> bool:
         return False
     store["entries"] = [e for e in store["entries"] if e["id"] != entry_id]
     store["files"].pop(entry_id, None)
+    store["thumbs"].pop(entry_id, None)
+    store["search"].remove(entry_id)
     return True
 
 
@@ -107,6 +217,8 @@ def clear_all() -> int:
     count = len(store["entries"])
     store["entries"] = []
     store["files"] = {}
+    store["thumbs"] = {}
+    store["search"].clear()
     return count
 
 
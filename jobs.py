@@ -0,0 +1,337 @@
+# Background jobs for long-running generations (video, podcast)
+#
+# Jobs run on a worker pool detached from the Streamlit script thread, and
+# their state is persisted in SQLite so a reloaded page can re-attach by id.
+# Finished results are written to disk and saved to history even if the
+# browser that started the job is gone.
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from rcjy_config import OUTPUT_DIR
+
+logger = logging.getLogger("rcjy.jobs")
+
+JOBS_DB = OUTPUT_DIR / "jobs.sqlite3"
+RESULTS_DIR = OUTPUT_DIR / "jobs"
+JOB_WORKERS = max(1, int(os.getenv("JOB_WORKERS", "2")))
+VIDEO_CHAIN_WORKERS = 2  # short video steps: submits, downloads, finishing
+JOB_RETENTION_SECONDS = 24 * 3600
+JOB_SWEEP_INTERVAL = 3600  # seconds between cleanups, across all processes
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+_ACTIVE = (QUEUED, RUNNING)
+
+_db_lock = threading.Lock()
+_init_lock = threading.Lock()
+_initialized = False
+_executor: Optional[ThreadPoolExecutor] = None
+_video_executor: Optional[ThreadPoolExecutor] = None
+_history = None
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(JOBS_DB, timeout=10)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _process_token() -> str:
+    # Identifies this process across module reloads and duplicate imports:
+    # its pid plus start time, so a restarted process reusing the pid differs
+    pid = os.getpid()
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            started = f.read().rsplit(b")", 1)[1].split()[19].decode()
+    except (OSError, IndexError):
+        started = "0"
+    return f"{pid}:{started}"
+
+
+def _token_alive(token: Optional[str]) -> bool:
+    # Whether the process a job's owner token names is still running here
+    try:
+        pid, started = token.split(":")
+        pid = int(pid)
+    except (AttributeError, ValueError):
+        return False
+    if started == "0":  # no /proc: the pid alone has to do
+        try:
+            os.kill(pid, 0)
+        except PermissionError:
+            return True
+        except OSError:
+            return False
+        return True
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            return f.read().rsplit(b")", 1)[1].split()[19].decode() == started
+    except (OSError, IndexError):
+        return False
+
+
+def _ensure_db():
+    # Set up the store on first use rather than at import
+    global _initialized
+    if _initialized:
+        return
+    with _init_lock:
+        if not _initialized:
+            _init_db()
+            _initialized = True
+
+
+def _init_db():
+    # Create schema, then clean up right away so jobs orphaned by a previous
+    # process don't wait for the next periodic sweep
+    RESULTS_DIR.mkdir(exist_ok=True)
+    with _db_lock, _connect() as conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL,
+                progress TEXT NOT NULL DEFAULT '',
+                params TEXT NOT NULL DEFAULT '{}',
+                mime TEXT,
+                result_file TEXT,
+                history_id TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                owner TEXT
+            )"""
+        )
+        if "owner" not in {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}:
+            conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+    _sweep(force=True)
+
+
+def _sweep(force: bool = False):
+    # Fail jobs orphaned by a process that is gone and drop results past
+    # JOB_RETENTION_SECONDS. Each job records the process running it, so jobs
+    # of another live process sharing JOBS_DB (a second worker, or an old
+    # process still shutting down) are left alone. Unless forced, runs at
+    # most once per JOB_SWEEP_INTERVAL, tracked in the meta table so all
+    # processes share the schedule.
+    now = time.time()
+    cutoff = now - JOB_RETENTION_SECONDS
+    token = _process_token()
+    segments = list(RESULTS_DIR.glob("*.seg*.wav"))
+    with _db_lock, _connect() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT value FROM meta WHERE key = 'swept_at'").fetchone()
+        if not force and row is not None and now - float(row["value"]) < JOB_SWEEP_INTERVAL:
+            return
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('swept_at', ?)", (str(now),))
+        active = conn.execute(
+            "SELECT id, owner FROM jobs WHERE status IN (?, ?)", _ACTIVE,
+        ).fetchall()
+        orphaned = [row["id"] for row in active
+                    if row["owner"] != token and not _token_alive(row["owner"])]
+        conn.executemany(
+            "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+            [(FAILED, "Interrupted by a server restart. Please try again.", now, job_id)
+             for job_id in orphaned],
+        )
+        running = {row["id"] for row in active} - set(orphaned)
+        stale = conn.execute(
+            "SELECT id, result_file FROM jobs WHERE updated_at < ?", (cutoff,),
+        ).fetchall()
+        for row in stale:
+            _remove_result(row["result_file"])
+        conn.execute("DELETE FROM jobs WHERE updated_at < ?", (cutoff,))
+    # Partial segments are only needed while their job runs; the listing was
+    # taken first, so a job queued meanwhile can't lose a fresh segment
+    for seg in segments:
+        if seg.name.split(".", 1)[0] not in running:
+            _remove_result(seg.name)
+
+
+def _remove_result(result_file: Optional[str]):
+    if not result_file:
+        return
+    try:
+        (RESULTS_DIR / result_file).unlink()
+    except OSError:
+        pass
+
+
+def _segment_files(job_id: str) -> list:
+    return sorted(RESULTS_DIR.glob(f"{job_id}.seg*.wav"))
+
+
+def _write_segment(job_id: str, index: int, wav: bytes):
+    # Partial audio for progressive playback while the job is still running
+    final = RESULTS_DIR / f"{job_id}.seg{index:03d}.wav"
+    tmp = RESULTS_DIR / f"{final.name}.tmp"
+    tmp.write_bytes(wav)
+    tmp.replace(final)
+
+
+def _update(job_id: str, **fields):
+    fields["updated_at"] = time.time()
+    cols = ", ".join(f"{k} = ?" for k in fields)
+    with _db_lock, _connect() as conn:
+        conn.execute(f"UPDATE jobs SET {cols} WHERE id = ?", (*fields.values(), job_id))
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _init_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="rcjy-job")
+        return _executor
+
+
+def _get_video_executor() -> ThreadPoolExecutor:
+    # Video jobs only hold a worker for short steps, so they get their own
+    # pool rather than queueing behind podcasts that occupy JOB_WORKERS for
+    # their whole run
+    global _video_executor
+    with _init_lock:
+        if _video_executor is None:
+            _video_executor = ThreadPoolExecutor(
+                max_workers=VIDEO_CHAIN_WORKERS, thread_name_prefix="rcjy-job-video",
+            )
+        return _video_executor
+
+
+def _runners() -> dict:
+    # kind -> generator function (imported lazily to keep startup light)
+    from generators import generate_podcast, start_video
+    return {"video": start_video, "podcast": generate_podcast}
+
+
+def configure(history_backend):
+    # Set the history module (GCS or local) that finished jobs are saved to
+    global _history
+    _history = history_backend
+
+
+def submit(kind: str, kwargs: dict, history_args: Optional[dict] = None) -> str:
+    # Queue a generation and return its job id immediately.
+    # history_args: {"prompt", "settings", "lang"} for history.save_entry
+    if kind not in _runners():
+        raise ValueError(f"Unsupported job kind: {kind!r}")
+    _ensure_db()
+    try:
+        _sweep()
+    except Exception:
+        logger.exception("Job cleanup failed")
+    job_id = uuid.uuid4().hex[:16]
+    now = time.time()
+    summary = {"prompt": (kwargs.get("prompt") or "")[:200], "history": history_args or {}}
+    with _db_lock, _connect() as conn:
+        conn.execute(
+            "INSERT INTO jobs (id, kind, status, params, created_at, updated_at, owner)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (job_id, kind, QUEUED, json.dumps(summary, ensure_ascii=False), now, now, _process_token()),
+        )
+    executor = _get_video_executor() if kind == "video" else _get_executor()
+    executor.submit(_run, job_id, kind, dict(kwargs), history_args)
+    logger.info("Job queued: %s (%s)", job_id, kind)
+    return job_id
+
+
+def _run(job_id: str, kind: str, kwargs: dict, history_args: Optional[dict]):
+    _update(job_id, status=RUNNING)
+    if kind == "video":
+        # The video chain holds a worker only while submitting or downloading;
+        # the job is finished from its completion callback, on a worker again
+        kwargs["progress_callback"] = lambda msg: _update(job_id, progress=str(msg)[:300])
+        try:
+            future = _runners()[kind](executor=_get_video_executor(), **kwargs)
+        except Exception as e:
+            _fail(job_id, kind, e)
+            return
+        future.add_done_callback(
+            lambda f: _get_video_executor().submit(_finish, job_id, kind, f.result, history_args),
+        )
+        return
+
+    kwargs["on_segment"] = lambda index, wav: _write_segment(job_id, index, wav)
+    try:
+        _finish(job_id, kind, lambda: _runners()[kind](**kwargs), history_args)
+    finally:
+        for seg in _segment_files(job_id):
+            _remove_result(seg.name)
+
+
+def _finish(job_id: str, kind: str, produce, history_args: Optional[dict]):
+    # Store a job's result and save it to history; produce() returns
+    # (bytes, mime) or raises the generation's error
+    try:
+        data, mime = produce()
+        result_file = f"{job_id}.bin"
+        tmp = RESULTS_DIR / f"{result_file}.tmp"
+        tmp.write_bytes(data)
+        tmp.replace(RESULTS_DIR / result_file)
+
+        history_id = None
+        if _history is not None and history_args is not None:
+            history_id = _history.save_entry(
+                kind, history_args.get("prompt", ""), data, mime,
+                history_args.get("settings"), history_args.get("lang", "en"),
+            )
+        _update(job_id, status=DONE, mime=mime, result_file=result_file,
+                history_id=history_id, progress="")
+        logger.info("Job done: %s (%s, %d bytes)", job_id, kind, len(data))
+    except Exception as e:
+        _fail(job_id, kind, e)
+
+
+def _fail(job_id: str, kind: str, exc: Exception):
+    from generators import _sanitize_error
+
+    logger.error("Job failed: %s (%s)", job_id, kind, exc_info=exc)
+    _update(job_id, status=FAILED, error=_sanitize_error(exc))
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    # Job state as a dict, or None if unknown/expired
+    if not job_id or not isinstance(job_id, str):
+        return None
+    _ensure_db()
+    with _connect() as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def is_active(job: Optional[dict]) -> bool:
+    return bool(job) and job["status"] in _ACTIVE
+
+
+def load_segments(job_id: str, start: int = 0) -> list[bytes]:
+    # WAV segments a running podcast job has produced so far, in order,
+    # skipping the first `start` the caller already has
+    if not job_id or not isinstance(job_id, str):
+        return []
+    segments = []
+    for path in _segment_files(job_id)[start:]:
+        try:
+            segments.append(path.read_bytes())
+        except OSError:
+            break  # removed as the job finished
+    return segments
+
+
+def load_result(job_id: str) -> tuple:
+    # Return (bytes, mime) for a finished job, or (None, None)
+    job = get_job(job_id)
+    if not job or job["status"] != DONE or not job["result_file"]:
+        return None, None
+    try:
+        return (RESULTS_DIR / job["result_file"]).read_bytes(), job["mime"]
+    except OSError:
+        logger.warning("Job result missing on disk: %s", job_id)
+        return None, None
+
@@ -0,0 +1,100 @@
+# Shared asyncio poller for long-running Veo operations
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger("rcjy.operation_tracker")
+
+# Adaptive poll schedule: 5s, 7.5s, 11s ... capped at 30s, each +/-20% jitter
+POLL_INITIAL = 5.0
+POLL_MAX = 30.0
+POLL_BACKOFF = 1.5
+POLL_JITTER = 0.2
+MAX_POLL_ERRORS = 3
+
+
+class OperationTracker:
+    # One event loop on a daemon thread supervises every tracked operation,
+    # so concurrent video jobs don't each hold a thread in time.sleep()
+
+    def __init__(self):
+        self._loop = None
+        self._lock = threading.Lock()
+        self._active = 0
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever, name="rcjy-op-tracker", daemon=True,
+                ).start()
+            return self._loop
+
+    @property
+    def active_count(self) -> int:
+        return self._active
+
+    def track(self, client, operation, timeout: float = 900, on_progress=None, on_done=None) -> Future:
+        # Start polling; returns a Future resolving to the finished operation.
+        # on_progress(elapsed_seconds) runs on the tracker thread after each poll.
+        loop = self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(
+            self._poll(client, operation, timeout, on_progress), loop,
+        )
+        if on_done:
+            future.add_done_callback(on_done)
+        return future
+
+    async def _poll(self, client, operation, timeout: float, on_progress):
+        self._active += 1
+        start = time.monotonic()
+        interval = POLL_INITIAL
+        next_log = 60
+        errors = 0
+        try:
+            while not operation.done:
+                elapsed = time.monotonic() - start
+                if elapsed >= timeout:
+                    raise TimeoutError(f"Video generation timed out after {max(1, round(timeout / 60))} minutes.")
+                delay = min(interval, timeout - elapsed) * random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER)
+                await asyncio.sleep(delay)
+                try:
+                    operation = await client.aio.operations.get(operation)
+                    errors = 0
+                except Exception as e:
+                    errors += 1
+                    if errors >= MAX_POLL_ERRORS:
+                        raise
+                    logger.warning("Operation poll failed (%d/%d): %s", errors, MAX_POLL_ERRORS, type(e).__name__)
+                interval = min(interval * POLL_BACKOFF, POLL_MAX)
+
+                elapsed = time.monotonic() - start
+                if elapsed >= next_log:
+                    logger.info("Video in progress... (%ds, %d active)", int(elapsed), self._active)
+                    next_log += 60
+                if on_progress:
+                    try:
+                        on_progress(elapsed)
+                    except Exception:
+                        logger.exception("Operation progress callback failed")
+            return operation
+        finally:
+            self._active -= 1
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def get_tracker() -> OperationTracker:
+    # Process-wide tracker
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = OperationTracker()
+        return _tracker
@@ -0,0 +1,159 @@
+# Token-bucket rate limiting per model, sized from MODEL_QUOTAS
+#
+# Every API call takes a token from its model's bucket first. When the bucket
+# is empty, callers reserve the next free slot in arrival order and sleep
+# until it comes up, so concurrent sessions queue fairly instead of all
+# hitting the quota at once and backing off on 429s.
+
+import logging
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from rcjy_config import DEFAULT_MODEL_QUOTA, MODEL_QUOTAS, OUTPUT_DIR, RATE_LIMIT_SHARED
+
+logger = logging.getLogger("rcjy.rate_limiter")
+
+LIMITS_DB = OUTPUT_DIR / "rate_limits.sqlite3"
+
+
+class RateLimited(Exception):
+    # The wait for a token would exceed the caller's timeout
+    def __init__(self, model_id: str, wait: float):
+        super().__init__(f"Model {model_id} is busy. Please try again in {int(wait) + 1}s.")
+        self.model_id = model_id
+        self.wait = wait
+
+
+class TokenBucket:
+    # rate tokens per second, up to burst. Tokens may go negative: each
+    # negative token is a queued reservation, served strictly in order.
+
+    def __init__(self, per_minute: float, burst: int = 1):
+        self.rate = per_minute / 60.0
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, timeout: Optional[float] = None) -> Optional[float]:
+        # Reserve a token; returns the seconds to wait before using it, or
+        # None (nothing reserved) if that would exceed timeout
+        with self._lock:
+            self._refill(time.monotonic())
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if timeout is not None and wait > timeout:
+                return None
+            self._tokens -= 1
+            return wait
+
+    def wait_estimate(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return max(0.0, (1 - self._tokens) / self.rate)
+
+
+class SharedTokenBucket:
+    # Same algorithm with state in SQLite, shared by every process on the host
+
+    def __init__(self, key: str, per_minute: float, burst: int = 1):
+        self.key = key
+        self.rate = per_minute / 60.0
+        self.burst = max(1, burst)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(LIMITS_DB, timeout=10, isolation_level=None)
+
+    def _take(self, take: bool, timeout: Optional[float]) -> Optional[float]:
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (self.key,)).fetchone()
+            tokens = float(self.burst) if row is None else min(self.burst, row[0] + (now - row[1]) * self.rate)
+            wait = max(0.0, (1 - tokens) / self.rate)
+            if take and (timeout is None or wait <= timeout):
+                tokens -= 1
+            elif take:
+                wait = None
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                (self.key, tokens, now),
+            )
+            conn.execute("COMMIT")
+            return wait
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def reserve(self, timeout: Optional[float] = None) -> Optional[float]:
+        return self._take(True, timeout)
+
+    def wait_estimate(self) -> float:
+        return self._take(False, None)
+
+
+class RateLimiter:
+    # One bucket per model id, created on first use
+
+    def __init__(self, quotas: dict = MODEL_QUOTAS, shared: bool = RATE_LIMIT_SHARED):
+        self._quotas = quotas
+        self._shared = shared
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, model_id: str):
+        with self._lock:
+            bucket = self._buckets.get(model_id)
+            if bucket is None:
+                per_minute, burst = self._quotas.get(model_id, DEFAULT_MODEL_QUOTA)
+                if self._shared:
+                    try:
+                        bucket = SharedTokenBucket(model_id, per_minute, burst)
+                    except sqlite3.Error:
+                        logger.warning("Shared rate limit store unavailable, using in-process limits")
+                        bucket = TokenBucket(per_minute, burst)
+                else:
+                    bucket = TokenBucket(per_minute, burst)
+                self._buckets[model_id] = bucket
+            return bucket
+
+    def acquire(self, model_id: str, timeout: Optional[float] = None) -> float:
+        # Block until a request to model_id may be sent; returns seconds waited.
+        # Raises RateLimited without queueing if the wait would exceed timeout.
+        wait = self._bucket(model_id).reserve(timeout)
+        if wait is None:
+            raise RateLimited(model_id, self.wait_estimate(model_id))
+        if wait > 0:
+            logger.info("Queued for %s: %.1fs", model_id, wait)
+            time.sleep(wait)
+        return wait
+
+    def wait_estimate(self, model_id: str) -> float:
+        # Seconds a new request to model_id would currently queue
+        return self._bucket(model_id).wait_estimate()
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter() -> RateLimiter:
+    # Process-wide limiter
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
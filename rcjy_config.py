@@ -157,6 +157,37 @@ MODELS = {
     },
 }
 
+# Request quotas per model id: (requests per minute, burst). Set these to
+# the project's actual Vertex AI / Gemini API quotas.
+_GROUP_QUOTAS = {
+    "video": (10, 2),
+    "image": (20, 4),
+    "voice": (30, 6),
+    "podcast": (60, 10),
+    "text": (60, 10),
+}
+DEFAULT_MODEL_QUOTA = (60, 10)
+MODEL_QUOTAS = {}
+for _group, _models in MODELS.items():
+    for _model_id in (_models.values() if isinstance(_models, dict) else [_models]):
+        MODEL_QUOTAS.setdefault(_model_id, _GROUP_QUOTAS.get(_group, DEFAULT_MODEL_QUOTA))
+
+# Share rate-limit buckets between worker processes on one host (SQLite)
+RATE_LIMIT_SHARED = os.getenv("RATE_LIMIT_SHARED", "0").lower() in ("1", "true", "yes")
+# Longest a UI request may queue for its model before being turned away
+RATE_LIMIT_MAX_WAIT = max(0, int(os.getenv("RATE_LIMIT_MAX_WAIT", "60")))
+
+# Max concurrent TTS requests per podcast
+TTS_MAX_CONCURRENCY = max(1, int(os.getenv("TTS_MAX_CONCURRENCY", "4")))
+
+# Generation result cache (text, image, voice); set RESULT_CACHE_TTL=0 to disable
+RESULT_CACHE_TTL = max(0, int(os.getenv("RESULT_CACHE_TTL", "3600")))
+RESULT_CACHE_MAX_MB = max(1, int(os.getenv("RESULT_CACHE_MAX_MB", "64")))
+RESULT_CACHE_DISK = os.getenv("RESULT_CACHE_DISK", "0").lower() in ("1", "true", "yes")
+
+# On-disk cache of extracted reference-URL text (conditional GET); 0 disables
+URL_CACHE_MAX_MB = max(0, int(os.getenv("URL_CACHE_MAX_MB", "32")))
+
 RCJY_LOGO_URL = (
     "https://www.rcjy.gov.sa/documents/5272171/0/"
     "color-logo.png/8a44644a-5216-1eaa-9c2a-99d90dd27c2d"
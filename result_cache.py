@@ -0,0 +1,175 @@
+# Cache of finished generations, keyed by the normalized request
+#
+# Identical requests (same function, model, prompt, context and settings)
+# return the stored result instead of calling the model again. Results live
+# in a size-bounded in-memory LRU and, optionally, in a disk tier under
+# OUTPUT_DIR that survives restarts and is shared by workers on one host.
+
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Optional
+
+from cache import DiskLRU, LRUCache
+from rcjy_config import OUTPUT_DIR, RESULT_CACHE_DISK, RESULT_CACHE_MAX_MB, RESULT_CACHE_TTL
+
+logger = logging.getLogger("rcjy.result_cache")
+
+DISK_DIR = OUTPUT_DIR / "result_cache"
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    # Whitespace and Unicode form don't change what the model is asked
+    return _WS_RE.sub(" ", unicodedata.normalize("NFC", prompt or "")).strip()
+
+
+def content_hash(*parts) -> str:
+    # Stable digest of context text and attachment bytes
+    h = hashlib.sha256()
+    for part in parts:
+        if part is None:
+            part = b""
+        elif isinstance(part, str):
+            part = part.encode("utf-8")
+        elif not isinstance(part, (bytes, bytearray, memoryview)):
+            part = json.dumps(part, sort_keys=True, default=str).encode("utf-8")
+        h.update(len(part).to_bytes(8, "big"))
+        h.update(part)
+    return h.hexdigest()
+
+
+def make_key(fn: str, model_id: str, prompt: str, context: str = "", settings: Optional[dict] = None) -> str:
+    payload = {
+        "fn": fn,
+        "model": model_id,
+        "prompt": normalize_prompt(prompt),
+        "context": context,
+        "settings": settings or {},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class _DiskTier:
+    # One file per result: a JSON header line followed by the raw payload.
+    # Bounded by total size; the least recently used files go first.
+
+    def __init__(self, root: Path, max_size: int, ttl: float):
+        self.ttl = ttl
+        self._files = DiskLRU(root, max_size, ".bin")
+
+    def get(self, key: str):
+        raw = self._files.read(key)
+        if raw is None:
+            return None
+        header_line, _, payload = raw.partition(b"\n")
+        try:
+            header = json.loads(header_line)
+        except ValueError:
+            return None
+        if self.ttl and time.time() - header.get("created", 0) > self.ttl:
+            self._files.delete(key)
+            return None
+        self._files.touch(key)
+        if header.get("kind") == "text":
+            return payload.decode("utf-8")
+        return payload, header.get("mime") or "application/octet-stream"
+
+    def set(self, key: str, value):
+        if isinstance(value, str):
+            header, payload = {"kind": "text"}, value.encode("utf-8")
+        else:
+            data, mime = value
+            header, payload = {"kind": "blob", "mime": mime}, bytes(data)
+        header["created"] = time.time()
+        if len(payload) <= self._files.max_size and not self._files.write(
+            key, json.dumps(header).encode("utf-8") + b"\n" + payload,
+        ):
+            logger.warning("Result cache write failed: %s", key[:12])
+
+    def clear(self):
+        self._files.clear()
+
+
+class ResultCache:
+    # Memory tier in front of an optional disk tier, with hit-rate counters
+
+    def __init__(self, ttl: float = RESULT_CACHE_TTL, max_size: int = RESULT_CACHE_MAX_MB * 1024 * 1024,
+                 disk: bool = RESULT_CACHE_DISK):
+        self.enabled = ttl > 0
+        self._memory = LRUCache(max_entries=256, max_size=max_size, ttl=ttl)
+        self._disk = _DiskTier(DISK_DIR, max_size * 4, ttl) if disk and self.enabled else None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        if not self.enabled:
+            return None
+        value = self._memory.get(key)
+        if value is None and self._disk is not None:
+            value = self._disk.get(key)
+            if value is not None:
+                self._memory.set(key, value)
+                with self._lock:
+                    self.disk_hits += 1
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: str, value):
+        if not self.enabled or value is None:
+            return
+        self._memory.set(key, value)
+        if self._disk is not None:
+            self._disk.set(key, value)
+
+    def get_or_compute(self, key: str, compute):
+        # Return a cached result or compute and store it. compute runs
+        # unlocked; identical requests racing on a miss each call the model.
+        cached = self.get(key)
+        if cached is not None:
+            logger.info("Result cache hit: %s (hit rate %.0f%%)", key[:12], self.stats()["hit_rate"] * 100)
+            return cached
+        value = compute()
+        self.set(key, value)
+        return value
+
+    def clear(self):
+        self._memory.clear()
+        if self._disk is not None:
+            self._disk.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "memory": self._memory.stats(),
+            }
+
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    # Process-wide cache
+    global _result_cache
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = ResultCache()
+        return _result_cache
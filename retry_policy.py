@@ -0,0 +1,161 @@
+# Retry engine for model API calls
+#
+# Errors are classified by type (google-genai APIError codes, transport
+# exceptions) rather than by message text. Waits honor the server's
+# RetryInfo / Retry-After hint when present and otherwise use exponential
+# backoff with full jitter, so concurrent sessions don't retry in lockstep.
+# A deadline caps the total time a generation may spend retrying.
+
+import logging
+import random
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional
+
+import httpx
+from google.genai import errors as genai_errors
+
+logger = logging.getLogger("rcjy.retry")
+
+RATE_LIMITED, TRANSIENT = "rate_limited", "transient"
+
+_TRANSIENT_CODES = {408, 500, 502, 503, 504}
+_TRANSPORT_ERRORS = (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError,
+                     TimeoutError, ConnectionError)
+_DURATION_RE = re.compile(r"^\s*([\d.]+)s\s*$")
+
+
+def classify(exc: BaseException) -> Optional[str]:
+    # RATE_LIMITED, TRANSIENT, or None for errors that must not be retried
+    # (bad requests, safety blocks, auth failures, programming errors)
+    if isinstance(exc, genai_errors.APIError):
+        if exc.code == 429 or exc.status == "RESOURCE_EXHAUSTED":
+            return RATE_LIMITED
+        if exc.code in _TRANSIENT_CODES or exc.status in ("UNAVAILABLE", "DEADLINE_EXCEEDED", "INTERNAL"):
+            return TRANSIENT
+        return None
+    if isinstance(exc, _TRANSPORT_ERRORS):
+        return TRANSIENT
+    return None
+
+
+def server_delay(exc: BaseException) -> Optional[float]:
+    # Seconds the server asked us to wait: google.rpc.RetryInfo in the error
+    # body, else the Retry-After header (delta-seconds or HTTP date)
+    details = getattr(exc, "details", None)
+    if isinstance(details, dict):
+        for item in (details.get("error") or {}).get("details") or []:
+            if isinstance(item, dict) and str(item.get("@type", "")).endswith("google.rpc.RetryInfo"):
+                m = _DURATION_RE.match(str(item.get("retryDelay", "")))
+                if m:
+                    return float(m.group(1))
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    value = headers.get("retry-after") if headers is not None else None
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                return None
+    return None
+
+
+class RetryMetrics:
+    # Per-model counters: calls, retries, rate_limited, transient, gave_up, wait_seconds
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data: dict[str, dict] = {}
+
+    def record(self, model_id: str, **deltas):
+        with self._lock:
+            row = self._data.setdefault(model_id or "unknown", {
+                "calls": 0, "retries": 0, "rate_limited": 0, "transient": 0, "gave_up": 0, "wait_seconds": 0.0,
+            })
+            for name, delta in deltas.items():
+                row[name] += delta
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {model: dict(row) for model, row in self._data.items()}
+
+
+class RetryPolicy:
+    # Exponential backoff with full jitter: attempt n waits uniform(0, min(cap, base * 2**n)).
+    # Rate limits use a larger base than transient errors. A server hint
+    # replaces the backoff (plus a little jitter to spread the herd).
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 2.0,
+        rate_limit_base_delay: float = 10.0,
+        max_delay: float = 60.0,
+        budget: float = 180.0,
+        metrics: Optional[RetryMetrics] = None,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.rate_limit_base_delay = rate_limit_base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self.metrics = metrics or RetryMetrics()
+
+    def delay(self, kind: str, attempt: int, exc: BaseException = None) -> float:
+        hint = server_delay(exc) if exc is not None else None
+        if hint is not None:
+            return hint + random.uniform(0, self.base_delay)
+        base = self.rate_limit_base_delay if kind == RATE_LIMITED else self.base_delay
+        return random.uniform(0, min(self.max_delay, base * (2 ** attempt)))
+
+    def call(
+        self,
+        fn: Callable,
+        model_id: str = "",
+        max_attempts: Optional[int] = None,
+        deadline: Optional[float] = None,
+        on_retry: Optional[Callable] = None,
+        retry_on: Optional[frozenset] = None,
+    ):
+        # Run fn, retrying retryable errors. deadline is an absolute
+        # time.monotonic() shared by every call of one generation; without it
+        # the policy's budget starts now. on_retry(exc, wait, attempt) runs
+        # before each sleep. retry_on narrows which kinds are retried, e.g.
+        # only RATE_LIMITED for calls that are not safe to repeat.
+        attempts = max_attempts or self.max_attempts
+        if deadline is None:
+            deadline = time.monotonic() + self.budget
+        self.metrics.record(model_id, calls=1)
+        for attempt in range(attempts):
+            try:
+                return fn()
+            except Exception as e:
+                kind = classify(e)
+                if kind is None or (retry_on is not None and kind not in retry_on):
+                    raise
+                self.metrics.record(model_id, **{kind: 1})
+                wait = self.delay(kind, attempt, e)
+                remaining = deadline - time.monotonic()
+                if attempt + 1 >= attempts or wait > remaining:
+                    self.metrics.record(model_id, gave_up=1)
+                    logger.warning("Giving up on %s after %d attempt(s): %s", model_id, attempt + 1, type(e).__name__)
+                    raise
+                logger.warning("%s on %s, retrying in %.1fs (attempt %d/%d)",
+                               kind, model_id, wait, attempt + 1, attempts)
+                self.metrics.record(model_id, retries=1, wait_seconds=wait)
+                if on_retry:
+                    on_retry(e, wait, attempt)
+                time.sleep(wait)
+
+
+_metrics = RetryMetrics()
+DEFAULT_POLICY = RetryPolicy(metrics=_metrics)
+
+
+def get_retry_metrics() -> dict:
+    # Per-model retry counters for the process
+    return _metrics.snapshot()
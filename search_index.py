@@ -0,0 +1,124 @@
+# Inverted index for searching history prompts and text outputs (Arabic + English)
+
+import re
+import threading
+from collections import Counter
+
+# Harakat, superscript alef and Quranic marks carry no meaning for search
+_TASHKEEL_RE = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed]")
+_TATWEEL = "\u0640"
+_AR_CHAR_MAP = str.maketrans({
+    "\u0623": "\u0627",  # alef with hamza above -> alef
+    "\u0625": "\u0627",  # alef with hamza below -> alef
+    "\u0622": "\u0627",  # alef with madda -> alef
+    "\u0671": "\u0627",  # alef wasla -> alef
+    "\u0649": "\u064a",  # alef maksura -> ya
+    "\u0629": "\u0647",  # ta marbuta -> ha
+    **{chr(0x0660 + d): str(d) for d in range(10)},  # Arabic-Indic digits
+    **{chr(0x06F0 + d): str(d) for d in range(10)},  # Extended (Persian) digits
+})
+_TOKEN_RE = re.compile(r"[^\W_]+")
+_AR_ARTICLES = ("\u0648\u0627\u0644", "\u0628\u0627\u0644", "\u0643\u0627\u0644", "\u0641\u0627\u0644", "\u0644\u0644", "\u0627\u0644")  # wal-, bal-, kal-, fal-, lil-, al-
+MIN_TOKEN_LEN = 2
+MAX_TERMS_PER_DOC = 5000
+
+
+def normalize(text: str) -> str:
+    # Case-fold Latin, unify Arabic letter variants, drop diacritics and tatweel
+    text = _TASHKEEL_RE.sub("", text.casefold()).replace(_TATWEEL, "")
+    return text.translate(_AR_CHAR_MAP)
+
+
+def _strip_article(token: str) -> str:
+    # Light stemming: the definite article (and its proclitics) is dropped
+    for article in _AR_ARTICLES:
+        if token.startswith(article) and len(token) - len(article) >= MIN_TOKEN_LEN:
+            return token[len(article):]
+    return token
+
+
+def tokenize(text: str) -> list[str]:
+    if not text:
+        return []
+    tokens = (_strip_article(t) for t in _TOKEN_RE.findall(normalize(text)))
+    return [t for t in tokens if len(t) >= MIN_TOKEN_LEN]
+
+
+def term_counts(text: str) -> dict[str, int]:
+    # Term frequencies for a document, capped to keep persisted postings small
+    return dict(Counter(tokenize(text)).most_common(MAX_TERMS_PER_DOC))
+
+
+class SearchIndex:
+    # Thread-safe in-memory inverted index: term -> {doc_id: frequency}.
+    # Documents are added and removed incrementally; nothing is rebuilt.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings: dict[str, dict[str, int]] = {}
+        self._docs: dict[str, tuple[str, ...]] = {}
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._docs
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def doc_ids(self) -> set:
+        with self._lock:
+            return set(self._docs)
+
+    def add(self, doc_id: str, terms: dict[str, int]):
+        # Index (or re-index) a document from its term counts
+        with self._lock:
+            self._remove_locked(doc_id)
+            for term, freq in terms.items():
+                self._postings.setdefault(term, {})[doc_id] = int(freq)
+            self._docs[doc_id] = tuple(terms)
+
+    def add_text(self, doc_id: str, text: str):
+        self.add(doc_id, term_counts(text))
+
+    def remove(self, doc_id: str):
+        with self._lock:
+            self._remove_locked(doc_id)
+
+    def clear(self):
+        with self._lock:
+            self._postings.clear()
+            self._docs.clear()
+
+    def _remove_locked(self, doc_id: str):
+        for term in self._docs.pop(doc_id, ()):
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            posting.pop(doc_id, None)
+            if not posting:
+                del self._postings[term]
+
+    def search(self, query: str) -> list[tuple[str, int]]:
+        # Every query term must match. The last term also matches as a prefix,
+        # so results update while the user is still typing.
+        # Returns [(doc_id, score)] with the best matches first.
+        terms = tokenize(query)
+        if not terms:
+            return []
+        with self._lock:
+            scores = None
+            for i, term in enumerate(terms):
+                if i == len(terms) - 1:
+                    matches = {}
+                    for t, posting in self._postings.items():
+                        if t.startswith(term):
+                            for doc_id, freq in posting.items():
+                                matches[doc_id] = matches.get(doc_id, 0) + freq
+                else:
+                    matches = self._postings.get(term, {})
+                if scores is None:
+                    scores = dict(matches)
+                else:
+                    scores = {d: s + matches[d] for d, s in scores.items() if d in matches}
+                if not scores:
+                    return []
+        return sorted(scores.items(), key=lambda item: -item[1])
@@ -0,0 +1,169 @@
+# Small preview artifacts for history entries
+
+import array
+import io
+import logging
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import wave
+from typing import Callable, Optional
+
+from PIL import Image, ImageDraw
+
+try:
+    import imageio_ffmpeg
+except ImportError:  # optional: falls back to an ffmpeg on PATH
+    imageio_ffmpeg = None
+
+logger = logging.getLogger("rcjy.thumbnails")
+
+THUMB_SIZE = (320, 320)
+WAVEFORM_SIZE = (320, 64)
+WAVEFORM_COLOR = (27, 131, 84)  # theme primary #1B8354
+_FFMPEG_TIMEOUT = 30  # seconds
+
+# Poster frames take an ffmpeg run per video, so one background worker makes
+# them instead of the caller's save path; a full queue skips the poster
+POSTER_QUEUE_SIZE = 8
+_poster_queue = queue.Queue(maxsize=POSTER_QUEUE_SIZE)
+_poster_worker_started = False
+_poster_lock = threading.Lock()
+
+
+def _to_webp(img: Image.Image) -> bytes:
+    img.thumbnail(THUMB_SIZE)
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+    buf = io.BytesIO()
+    img.save(buf, format="WEBP", quality=75, method=4)
+    return buf.getvalue()
+
+
+def image_thumbnail(data: bytes) -> Optional[bytes]:
+    # Downscaled WebP of an image
+    with Image.open(io.BytesIO(data)) as img:
+        img.draft("RGB", THUMB_SIZE)  # JPEG: decode at reduced scale
+        return _to_webp(img)
+
+
+def _ffmpeg_exe() -> Optional[str]:
+    # imageio-ffmpeg's bundled binary, else a system ffmpeg
+    if imageio_ffmpeg is not None:
+        try:
+            return imageio_ffmpeg.get_ffmpeg_exe()
+        except RuntimeError:
+            pass
+    return shutil.which("ffmpeg")
+
+
+def video_poster(data: bytes) -> Optional[bytes]:
+    # WebP poster frame via ffmpeg, if available
+    ffmpeg = _ffmpeg_exe()
+    if ffmpeg is None:
+        return None
+    fd, src = tempfile.mkstemp(suffix=".mp4", prefix="rcjy_poster_")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        result = subprocess.run(
+            [ffmpeg, "-v", "error", "-ss", "1", "-i", src, "-frames:v", "1",
+             "-f", "image2pipe", "-vcodec", "png", "-"],
+            capture_output=True, timeout=_FFMPEG_TIMEOUT, check=False,
+        )
+        if result.returncode != 0 or not result.stdout:
+            return None
+        with Image.open(io.BytesIO(result.stdout)) as img:
+            return _to_webp(img)
+    finally:
+        os.remove(src)
+
+
+def _poster_loop():
+    while True:
+        load, store = _poster_queue.get()
+        try:
+            poster = video_poster(load())
+            if poster:
+                store(poster)
+        except Exception:
+            logger.warning("Video poster generation failed", exc_info=True)
+
+
+def schedule_poster(load: Callable[[], bytes], store: Callable[[bytes], None]) -> bool:
+    # Make a video's WebP poster in the background: load() returns the video
+    # bytes, store(webp) keeps the result. False when no ffmpeg is available
+    # or the queue is full, i.e. no poster will come.
+    global _poster_worker_started
+    if _ffmpeg_exe() is None:
+        return False
+    with _poster_lock:
+        if not _poster_worker_started:
+            threading.Thread(target=_poster_loop, name="rcjy-poster", daemon=True).start()
+            _poster_worker_started = True
+    try:
+        _poster_queue.put_nowait((load, store))
+    except queue.Full:
+        logger.info("Poster queue full, skipping video poster")
+        return False
+    return True
+
+
+def audio_waveform(data: bytes) -> Optional[bytes]:
+    # Peak waveform PNG for 16-bit PCM WAV (first channel)
+    try:
+        with wave.open(io.BytesIO(data), "rb") as w:
+            if w.getsampwidth() != 2:
+                return None
+            channels = w.getnchannels()
+            frames = w.readframes(w.getnframes())
+    except (wave.Error, EOFError):
+        return None
+    samples = array.array("h")
+    samples.frombytes(frames[: len(frames) - len(frames) % 2])
+    if sys.byteorder == "big":
+        samples.byteswap()
+    samples = samples[::channels]
+    if not samples:
+        return None
+
+    width, height = WAVEFORM_SIZE
+    mid = height / 2
+    per_col = max(1, len(samples) // width)
+    step = max(1, per_col // 64)  # sample each column sparsely; peaks stay visible
+    img = Image.new("RGBA", WAVEFORM_SIZE, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    for x in range(min(width, len(samples))):
+        col = samples[x * per_col:(x + 1) * per_col:step]
+        if not col:
+            break
+        peak = max(max(col), -min(col)) / 32768
+        h = max(1.0, peak * mid)
+        draw.line([(x, mid - h), (x, mid + h)], fill=WAVEFORM_COLOR)
+    buf = io.BytesIO()
+    img.save(buf, format="PNG", optimize=True)
+    return buf.getvalue()
+
+
+def make_thumbnail(data, mime: str) -> tuple:
+    # Returns (bytes, mime, ext) for a preview, or (None, None, None).
+    # Video posters are not made here; see schedule_poster.
+    if not isinstance(data, (bytes, bytearray)) or not mime:
+        return None, None, None
+    try:
+        if mime.startswith("image/"):
+            thumb, thumb_mime, ext = image_thumbnail(data), "image/webp", ".webp"
+        elif mime in ("audio/wav", "audio/x-wav"):
+            thumb, thumb_mime, ext = audio_waveform(data), "image/png", ".png"
+        else:
+            return None, None, None
+    except Exception:
+        logger.warning("Thumbnail generation failed for %s", mime, exc_info=True)
+        return None, None, None
+    if not thumb:
+        return None, None, None
+    return thumb, thumb_mime, ext
@@ -0,0 +1,99 @@
+# On-disk cache of extracted reference-URL text, revalidated with conditional GETs
+#
+# Each entry keeps the cleaned text together with the response's ETag and
+# Last-Modified. The next fetch of the same URL sends them back as
+# If-None-Match / If-Modified-Since, only to the redirect hop that issued
+# them; on 304 the stored text is reused without downloading or parsing the
+# page again. Total size is bounded and the least recently used entries are
+# evicted first.
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from cache import DiskLRU
+from rcjy_config import OUTPUT_DIR, URL_CACHE_MAX_MB
+
+logger = logging.getLogger("rcjy.url_cache")
+
+CACHE_DIR = OUTPUT_DIR / "url_cache"
+
+
+class UrlCache:
+    def __init__(self, root: Path = CACHE_DIR, max_size: int = URL_CACHE_MAX_MB * 1024 * 1024):
+        self.enabled = max_size > 0
+        self._files = DiskLRU(root, max_size, ".json") if self.enabled else None
+        self._lock = threading.Lock()
+        self.revalidated = 0
+        self.stored = 0
+
+    @staticmethod
+    def _key(url: str, max_chars: int) -> str:
+        return hashlib.sha256(f"{max_chars}\n{url}".encode("utf-8")).hexdigest()
+
+    def get(self, url: str, max_chars: int) -> Optional[dict]:
+        # Stored entry {url, validated_url, etag, last_modified, text, stored} or None
+        if not self.enabled:
+            return None
+        raw = self._files.read(self._key(url, max_chars))
+        if raw is None:
+            return None
+        try:
+            entry = json.loads(raw)
+        except ValueError:
+            return None
+        return entry if entry.get("url") == url else None
+
+    @staticmethod
+    def conditional_headers(entry: Optional[dict], hop_url: str) -> dict:
+        # Validators only mean something to the URL that issued them
+        headers = {}
+        if entry and entry.get("validated_url") == hop_url:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def not_modified(self, url: str, max_chars: int, entry: dict) -> str:
+        # The server confirmed the stored copy (304); mark it recently used
+        self._files.touch(self._key(url, max_chars))
+        with self._lock:
+            self.revalidated += 1
+        logger.info("URL cache revalidated: %s", url)
+        return entry["text"]
+
+    def set(self, url: str, max_chars: int, text: str, etag: Optional[str], last_modified: Optional[str],
+            validated_url: Optional[str] = None):
+        # Only responses with a validator are worth keeping: without one the
+        # page could never be revalidated. validated_url is the URL that
+        # returned the validators (the last redirect hop), if not url itself.
+        if not self.enabled or not (etag or last_modified):
+            return
+        payload = json.dumps({
+            "url": url,
+            "validated_url": validated_url or url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "text": text,
+            "stored": time.time(),
+        }, ensure_ascii=False).encode("utf-8")
+        if len(payload) > self._files.max_size:
+            return
+        if not self._files.write(self._key(url, max_chars), payload):
+            logger.warning("URL cache write failed: %s", url)
+            return
+        with self._lock:
+            self.stored += 1
+
+    def clear(self):
+        if self.enabled:
+            self._files.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"enabled": self.enabled, "revalidated": self.revalidated, "stored": self.stored}